@@ -1,17 +1,37 @@
+import asyncio
 import calendar
+from contextlib import contextmanager
+import csv
 from datetime import date
-from itertools import groupby
-from operator import itemgetter
+import io
+import logging
+import time
 from typing import Dict, List, Optional, Union
+from urllib.parse import parse_qsl
 
-from fastapi import FastAPI
+import config
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse
-import psycopg
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import orjson
+from psycopg_pool import PoolTimeout
 from pydantic import BaseModel
 
-from config import PG_CREDS
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from backend import db
+import cache
+import http_cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# most series that can be requested from the dashboard endpoint at once
+DASHBOARD_MAX_SERIES = getattr(config, "DASHBOARD_MAX_SERIES", 20)
 
 
 class RateResponse(BaseModel):
@@ -64,6 +84,7 @@ responses = {
     400: {"model": Error, "description": "Bad Request"},
     404: {"model": Error, "description": "Not Found"},
     500: {"model": Error, "description": "Internal Server Error"},
+    503: {"model": Error, "description": "Service Unavailable"},
 }
 app.add_middleware(
     CORSMiddleware,
@@ -72,70 +93,360 @@ app.add_middleware(
     allow_methods=["GET"],
     allow_headers=["*"],
 )
+app.middleware("http")(http_cache.http_caching)
+# (added last, so that it's the outermost middleware and times the others too)
+app.middleware("http")(metrics.track_requests)
+
+
+@app.on_event("startup")
+async def startup():
+    await db.open_pool()
+    cache.start_polling()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    cache.stop_polling()
+    await db.close_pool()
 
 
 areas = ["United States", "DVRPC Region", "Philadelphia MSA", "Trenton MSA"]
 
+# fields of the response model for each table, in the same order as the table's columns
+fields = {
+    "cpi": ["period", "area", "index", "rate"],
+    "unemployment_rate": ["period", "area", "rate"],
+    "housing": ["period", "units"],
+}
+
+
+@contextmanager
+def database_errors():
+    """Translate database failures into EconDataErrors."""
+    try:
+        yield
+    except PoolTimeout:
+        raise EconDataError(503, "Database busy; please try again shortly.")
+    except db.OperationalError:
+        raise EconDataError(500, "Database error")
+
+
+async def query_db(table: str, query: str, params=None) -> list:
+    """
+    Run *query* (as a prepared statement) on a pooled connection, translating database failures
+    into EconDataErrors. The time taken and rows returned are recorded as *table*'s.
+    """
+    with database_errors(), metrics.QUERY_SECONDS.labels(table).time():
+        result = await db.fetch_all(query, params, prepare=True)
+    metrics.QUERY_ROWS.labels(table).inc(len(result))
+    return result
+
+
+def to_dicts(table: str, rows: list) -> list:
+    """
+    Convert *rows* from *table* into dicts with the fields of the table's response model.
+
+    This, together with encode(), produces the same JSON that FastAPI would from a list of response
+    models, but without building (and then validating and encoding) a model for every row.
+    """
+    table_fields = fields[table]
+    return [dict(zip(table_fields, row)) for row in rows]
+
+
+def to_columns(table: str, rows: list) -> dict:
+    """Convert *rows* from *table* into a dict of one list per field of its response model."""
+    return dict(zip(fields[table], map(list, zip(*rows))))
+
+
+def encode(data) -> bytes:
+    """Encode *data* to JSON."""
+    return orjson.dumps(data)
+
+
+def encode_ndjson(table: str, rows: list) -> bytes:
+    """Encode *rows* from *table* as newline-delimited JSON, one object per row."""
+    table_fields = fields[table]
+    return b"".join(
+        orjson.dumps(dict(zip(table_fields, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows
+    )
+
+
+def encode_csv(table: str, rows: list, header: bool = True) -> bytes:
+    """Encode *rows* from *table* as CSV, with a header row of the response model's fields."""
+    table_fields = fields[table]
+    f = io.StringIO()
+    writer = csv.writer(f, lineterminator="\n")
+    if header:
+        writer.writerow(table_fields)
+    writer.writerows(row[: len(table_fields)] for row in rows)
+    return f.getvalue().encode()
+
+
+if pa:
+    # Arrow schema for each table, with the same fields as its response model
+    arrow_schemas = {
+        "cpi": pa.schema(
+            [
+                ("period", pa.date32()),
+                ("area", pa.dictionary(pa.int8(), pa.string())),
+                ("index", pa.float64()),
+                ("rate", pa.float64()),
+            ]
+        ),
+        "unemployment_rate": pa.schema(
+            [
+                ("period", pa.date32()),
+                ("area", pa.dictionary(pa.int8(), pa.string())),
+                ("rate", pa.float64()),
+            ]
+        ),
+        "housing": pa.schema([("period", pa.date32()), ("units", pa.int32())]),
+    }
+
+
+def encode_arrow(table: str, rows: list) -> bytes:
+    """Encode *rows* from *table* as a single record batch in the Arrow IPC streaming format."""
+    schema = arrow_schemas[table]
+    batch = pa.RecordBatch.from_pydict(to_columns(table, rows), schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
 
-def get_data(
-    table: str, area: str = None, start_year: int = None, end_year: int = None
-) -> List[Union[RateResponse, IndexRateResponse, UnitsResponse]]:
-    """Get data from *table*, with optional query parameters."""
+# format: (media type, function to encode rows from a table)
+formats = {
+    "json": ("application/json", lambda table, rows: encode(to_dicts(table, rows))),
+    "ndjson": ("application/x-ndjson", encode_ndjson),
+    "columns": ("application/json", lambda table, rows: encode(to_columns(table, rows))),
+    "csv": ("text/csv", encode_csv),
+}
+if pa:
+    formats["arrow"] = ("application/vnd.apache.arrow.stream", encode_arrow)
+
+
+# The stream_* functions encode batches of rows from *table* as they're fetched, producing the
+# same output as the corresponding encoder in formats (except that Arrow streams are split into
+# a record batch per batch of rows).
+async def stream_json(table: str, batches):
+    separator = b"["
+    async for rows in batches:
+        yield separator + encode(to_dicts(table, rows))[1:-1]
+        separator = b","
+    yield b"]"
+
+
+async def stream_ndjson(table: str, batches):
+    async for rows in batches:
+        yield encode_ndjson(table, rows)
+
+
+async def stream_csv(table: str, batches):
+    header = True
+    async for rows in batches:
+        yield encode_csv(table, rows, header)
+        header = False
+
+
+async def stream_arrow(table: str, batches):
+    schema = arrow_schemas[table]
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        async for rows in batches:
+            writer.write_batch(pa.RecordBatch.from_pydict(to_columns(table, rows), schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # end-of-stream marker, written when the writer is closed
+    yield sink.getvalue()
+
+
+stream_encoders = {
+    "json": stream_json,
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+}
+if pa:
+    stream_encoders["arrow"] = stream_arrow
+
+
+def cached_response(body: bytes, media_type: str = "application/json") -> Response:
+    return Response(content=body, media_type=media_type)
+
+
+async def stream_response(table: str, query: str, params, format: str) -> StreamingResponse:
+    """
+    Stream the results of *query* from *table*, encoded in *format*, as they're fetched.
+
+    Rows are read from a server-side cursor a batch at a time, so memory use doesn't depend on the
+    number of rows, and the first rows are sent without waiting for the rest. The first batch is
+    fetched before responding, so that database errors and empty results are reported with the
+    usual status codes; errors after that can only cut the response short.
+    """
+    if format not in stream_encoders:
+        message = "Please enter a format that can be streamed. Must be one of: " + ", ".join(
+            stream_encoders
+        )
+        raise EconDataError(400, message)
+
+    start = time.perf_counter()
+    batches = db.stream(query, params)
+    try:
+        with database_errors():
+            first = await batches.__anext__()
+    except StopAsyncIteration:
+        raise EconDataError(404, "No data available for given criteria.")
+
+    async def all_batches():
+        # (the query's time is until the last batch has been fetched, which includes sending the
+        # ones before it)
+        rows_streamed = len(first)
+        yield first
+        try:
+            async for rows in batches:
+                rows_streamed += len(rows)
+                yield rows
+        except db.Error as e:
+            logger.error(f"Error streaming from {table}: {e}")
+            raise
+        finally:
+            metrics.QUERY_SECONDS.labels(table).observe(time.perf_counter() - start)
+            metrics.QUERY_ROWS.labels(table).inc(rows_streamed)
+
+    return StreamingResponse(
+        stream_encoders[format](table, all_batches()), media_type=formats[format][0]
+    )
+
+
+def data_query(
+    table: str,
+    area: str = None,
+    start_year: int = None,
+    end_year: int = None,
+    region: str = None,
+) -> tuple:
+    """Build the query for get_data()'s rows from *table*, and return it with its parameters."""
     # build query, starting with base (all items), and then limit by query params
+    # (values are passed as parameters, so each combination of parameters is a single statement
+    # that can be prepared once and reused)
     query = "SELECT * FROM " + table
     q_modifiers = []
+    params = []
+
+    if region and region != "DVRPC Region":
+        # the period conditions below are pushed down into the aggregate, so this only reads the
+        # region's counties' rows for those periods, through housing_county's primary key
+        query = f"""
+            SELECT * FROM (
+                SELECT period, CAST(sum(units) AS integer) AS units
+                FROM housing_county
+                JOIN region_county USING (fips)
+                WHERE region = %s
+                GROUP BY period
+            ) AS {table}
+        """
+        params.append(region)
+
+    if area:
+        q_modifiers.append("area = %s")
+        params.append(area)
+
+    # compare periods against dates (rather than comparing their year against the year), so that
+    # the query can use the indexes on period
+    # (years are limited to those a date can have; there's no data outside them anyway)
+    if start_year:
+        q_modifiers.append("period >= %s")
+        params.append(date(min(max(start_year, date.min.year), date.max.year), 1, 1))
+
+    if end_year:
+        q_modifiers.append("period <= %s")
+        params.append(date(min(max(end_year, date.min.year), date.max.year), 12, 31))
+
+    if q_modifiers:
+        query += " WHERE " + " AND ".join(q_modifiers)
+
+    if table in ["cpi", "unemployment_rate"]:
+        query += " ORDER BY period, area ASC"
+    else:
+        query += " ORDER BY period ASC"
+
+    return query, params
+
+
+async def get_data(
+    table: str,
+    area: str = None,
+    start_year: int = None,
+    end_year: int = None,
+    format: str = None,
+    stream: bool = None,
+    region: str = None,
+) -> Response:
+    """
+    Get data from *table*, with optional query parameters.
+
+    For housing, *region* selects the region (one of those in the region_county table) whose
+    counties' units are totaled. The DVRPC Region's totals are kept in the housing table itself;
+    other regions' are summed from the housing_county table when queried.
+
+    By default, the response is encoded as a list of RateResponse, IndexRateResponse, or
+    UnitsResponse. *format* can instead be one of:
+      * "ndjson": newline-delimited JSON, one RateResponse, etc. per line
+      * "columns": a JSON object with one list per field
+      * "csv": CSV, with a header row of the fields
+      * "arrow": an Arrow IPC stream (if pyarrow is installed)
+
+    The response is cached until the table's data changes. With *stream*, it's instead sent as
+    the rows are fetched (see stream_response()), unless it's already cached.
+    """
+    if not format:
+        format = "json"
+    if format not in formats:
+        message = "Please enter a valid format. Must be one of: " + ", ".join(formats)
+        raise EconDataError(400, message)
+    media_type, encoder = formats[format]
 
     if area:
         if area not in areas:
             message = "Please enter a valid area. Must be one of: " + ", ".join(areas)
             raise EconDataError(400, message)
-        q_modifiers.append("area = '" + area + "'")
+
+    if region:
+        # (regions are only checked once they've been read from the database; until then, an
+        # unknown region just finds no data)
+        if cache.regions and region not in cache.regions:
+            message = "Please enter a valid region. Must be one of: " + ", ".join(cache.regions)
+            raise EconDataError(400, message)
 
     if start_year and end_year:
         if end_year < start_year:
             message = "end_year must be after start_year"
             raise EconDataError(400, message)
 
-    # we don't need to validate that year is an int b/c of coercion by pydantic into int
-    # (FastAPI will handle this error), but we do need to convert it back to a string
-    if start_year:
-        q_modifiers.append("date_part('year', period) >= '" + str(start_year) + "'")
-
-    if end_year:
-        q_modifiers.append("date_part('year', period) <= '" + str(end_year) + "'")
+    # (a region stands in for the area; no table has both)
+    key = (table, area or region, start_year, end_year, None, format)
+    version = cache.data_versions.get(table)
+    body = cache.response_cache.get(key, version)
+    if body is not None:
+        return cached_response(body, media_type)
 
-    if q_modifiers:
-        query += " WHERE " + " AND ".join(q_modifiers)
+    query, params = data_query(table, area, start_year, end_year, region)
 
-    if table in ["cpi", "unemployment_rate"]:
-        query += " ORDER BY period, area ASC"
+    if stream:
+        return await stream_response(table, query, params, format)
 
-    try:
-        with psycopg.connect(PG_CREDS) as conn:
-            result = conn.execute(query).fetchall()
-    except psycopg.OperationalError:
-        raise EconDataError(500, "Database error")
+    result = await query_db(table, query, params)
 
     if not result:
         raise EconDataError(404, "No data available for given criteria.")
 
-    data = []
-    for row in result:
-        if table == "cpi":
-            item = {"period": row[0], "area": row[1], "index": row[2], "rate": row[3]}
-            data.append(IndexRateResponse(**item))
-        elif table == "unemployment_rate":
-            item = {"period": row[0], "area": row[1], "rate": row[2]}
-            data.append(RateResponse(**item))
-        elif table == "housing":
-            item = {"period": row[0], "units": row[1]}
-            data.append(UnitsResponse(**item))
-    return data
+    with metrics.ENCODE_SECONDS.labels(format).time():
+        body = encoder(table, result)
+    cache.response_cache.set(key, version, body)
+    return cached_response(body, media_type)
 
 
-def get_recent_matching_data(
-    table: str, years: int = None
-) -> List[Union[RateResponse, IndexRateResponse]]:
+async def get_recent_matching_data(table: str, years: int = None) -> Response:
     """
     Get data only when it exists for all series per period.
 
@@ -148,54 +459,56 @@ def get_recent_matching_data(
     return an additional leading month of national data compared to local data.
 
     If *years* isn't provided, default to returning 1 year of data.
+
+    As with get_data(), the encoded response is cached until the table's data changes.
     """
 
     if not years:
         years = 1
-
-    # set vars per table
-    # count: number of series in table (for subquery that gets only data that has *count*
-    #   items per period (i.e., if less than this, data not available for all series))
-    # periods:
-    #   CPI = bimonthly for 2 series, so 12 = 1 year of data
-    #   unemployment = monthly for 3 series, so 36 = 1 year of data
+    if years < 1:
+        raise EconDataError(400, "years must be at least 1")
+    # (limited to the years a date can have; there's no data beyond them anyway)
+    years = min(years, date.max.year)
+
+    key = (table, None, None, None, years, None)
+    version = cache.data_versions.get(table)
+    body = cache.response_cache.get(key, version)
+    if body is not None:
+        return cached_response(body)
+
+    # periods per year for which data is available for all series:
+    #   CPI = bimonthly, so 6 = 1 year of data
+    #   unemployment = monthly, so 12 = 1 year of data
     if table == "cpi":
-        count = 2
-        periods = years * 12
+        periods = years * 6
 
     if table == "unemployment_rate":
-        count = 3
-        periods = years * 36
+        periods = years * 12
 
+    # the complete_periods table (maintained by the data/ scripts) holds the periods with data
+    # for all series, so this is an index scan of the most recent ones rather than an aggregate
+    # over the whole table
     query = f"""
-        SELECT * FROM {table}
-        WHERE period IN
-            (SELECT period FROM {table}
-                GROUP BY period
-                HAVING COUNT(area) = {count}
-            )
+        SELECT {table}.* FROM {table}
+        JOIN
+            (SELECT period FROM complete_periods
+                WHERE table_name = %s
+                ORDER BY period DESC
+                LIMIT %s
+            ) AS recent
+            USING (period)
         ORDER BY period DESC, area ASC
-        LIMIT {periods}
     """
 
-    try:
-        with psycopg.connect(PG_CREDS) as conn:
-            result = conn.execute(query).fetchall()
-    except psycopg.OperationalError:
-        raise EconDataError(500, "Database error")
+    result = await query_db(table, query, (table, periods))
 
     if not result:
         raise EconDataError(404, "No data available for given criteria.")
 
-    data = []
-    for row in result:
-        if table == "cpi":
-            item = {"period": row[0], "area": row[1], "index": row[2], "rate": row[3]}
-            data.append(IndexRateResponse(**item))
-        elif table == "unemployment_rate":
-            item = {"period": row[0], "area": row[1], "rate": row[2]}
-            data.append(RateResponse(**item))
-    return data
+    with metrics.ENCODE_SECONDS.labels("json").time():
+        body = encode(to_dicts(table, result))
+    cache.response_cache.set(key, version, body)
+    return cached_response(body)
 
 
 @app.get(
@@ -203,12 +516,16 @@ def get_recent_matching_data(
     response_model=List[RateResponse],
     responses=responses,
 )
-def unemployment_rate(
-    area: Optional[str] = None, start_year: Optional[int] = None, end_year: Optional[int] = None
+async def unemployment_rate(
+    area: Optional[str] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    format: Optional[str] = None,
+    stream: Optional[bool] = None,
 ):
     """Get the unemployment rate for the United States, Philadelphia MSA, and Trenton MSA."""
     try:
-        data = get_data("unemployment_rate", area, start_year, end_year)
+        data = await get_data("unemployment_rate", area, start_year, end_year, format, stream)
     except EconDataError as e:
         return JSONResponse(
             status_code=e.status_code,
@@ -223,8 +540,12 @@ def unemployment_rate(
     responses=responses,
     summary="CPI",
 )
-def cpi(
-    area: Optional[str] = None, start_year: Optional[int] = None, end_year: Optional[int] = None
+async def cpi(
+    area: Optional[str] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    format: Optional[str] = None,
+    stream: Optional[bool] = None,
 ):
     """
     Get the CPI for All Urban Consumers index (1982-84=100) and year-over-year percentage change
@@ -232,7 +553,7 @@ def cpi(
     from which this data comes.)
     """
     try:
-        data = get_data("cpi", area, start_year, end_year)
+        data = await get_data("cpi", area, start_year, end_year, format, stream)
     except EconDataError as e:
         return JSONResponse(
             status_code=e.status_code,
@@ -246,13 +567,13 @@ def cpi(
     response_model=List[RateResponse],
     responses=responses,
 )
-def recent_unemployment_rates(years: Optional[int] = None):
+async def recent_unemployment_rates(years: Optional[int] = None):
     """
     Get the most recent unemployment rate for the United States, Philadelphia MSA, and Trenton MSA
     where data is available for all areas.
     """
     try:
-        data = get_recent_matching_data("unemployment_rate", years)
+        data = await get_recent_matching_data("unemployment_rate", years)
     except EconDataError as e:
         return JSONResponse(
             status_code=e.status_code,
@@ -267,14 +588,14 @@ def recent_unemployment_rates(years: Optional[int] = None):
     responses=responses,
     summary="Recent CPI",
 )
-def recent_cpi(years: Optional[int] = None):
+async def recent_cpi(years: Optional[int] = None):
     """
     Get the most recent CPI for All Urban Consumers index (1982-84=100) and year-over-year
     percentage change for the United States and Philadelphia MSA, where data is available for both
     areas. (Trenton MSA is not included in the BLS survey from which this data comes.)
     """
     try:
-        data = get_recent_matching_data("cpi", years)
+        data = await get_recent_matching_data("cpi", years)
     except EconDataError as e:
         return JSONResponse(
             status_code=e.status_code,
@@ -284,124 +605,174 @@ def recent_cpi(years: Optional[int] = None):
     return data
 
 
+async def get_employment_by_industry() -> Response:
+    """
+    Get the summary of employment by industry (see employment_by_industry()), cached until the
+    data changes.
+    """
+    key = ("employment_by_industry", None, None, None, None, None)
+    version = cache.data_versions.get("employment_by_industry")
+    body = cache.response_cache.get(key, version)
+    if body is not None:
+        return cached_response(body)
+
+    # the summary of the most recent period and the one a year before it is built by
+    # data/industry_employment.py whenever it loads new data
+    query = """
+        SELECT
+            period,
+            area,
+            industry,
+            number,
+            share_of_total,
+            change1year,
+            percentchange1year,
+            change2year,
+            percentchange2year
+        FROM employment_by_industry_summary
+        ORDER BY period DESC, industry ASC, area ASC
+    """
+
+    result = await query_db("employment_by_industry_summary", query)
+    if not result:
+        raise EconDataError(404, "No data available for given criteria.")
+
+    with metrics.ENCODE_SECONDS.labels("json").time():
+        # reshape into {friendly date: {industry: {area: figures}}}
+        summary_data = {}
+        for row in result:
+            friendly_date = calendar.month_name[row[0].month] + " " + str(row[0].year)
+            industry = summary_data.setdefault(friendly_date, {}).setdefault(row[2], {})
+            industry[row[1]] = {
+                "employment": row[3],
+                "share of total": row[4],
+                "one-year change (number)": row[5],
+                "one-year change (percent)": row[6],
+                "two-year change (number)": row[7],
+                "two-year change (percent)": row[8],
+            }
+
+        body = encode(summary_data)
+    cache.response_cache.set(key, version, body)
+    return cached_response(body)
+
+
 @app.get(
     "/api/econ-data/v1/employment-by-industry",
     response_model=Dict,
     responses=responses,
 )
-def employment_by_industry():
+async def employment_by_industry():
     """
     Get the most recent employment, and 1- and 2-year change/percentage change, by industry
     for the Philaladelphia and Trenton MSAs.
     """
-    query = "SELECT * FROM employment_by_industry ORDER BY period DESC, industry ASC"
+    try:
+        data = await get_employment_by_industry()
+    except EconDataError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"message": e.message},
+        )
+    return data
+
+
+# route (relative to /api/econ-data/v1/): table, for the routes served by get_data()
+data_routes = {"cpi": "cpi", "unemployment": "unemployment_rate", "housing": "housing"}
+# route: table, for the routes served by get_recent_matching_data()
+recent_routes = {"cpi-recent": "cpi", "unemployment-recent": "unemployment_rate"}
 
+
+def int_param(params: dict, name: str) -> Optional[int]:
+    """Get the integer query parameter *name* from *params*, if given."""
+    if not params.get(name):
+        return None
     try:
-        with psycopg.connect(PG_CREDS) as conn:
-            result = conn.execute(query).fetchall()
-    except psycopg.OperationalError:
-        raise EconDataError(500, "Database error")
+        return int(params[name])
+    except ValueError:
+        raise EconDataError(400, f"{name} must be an integer")
 
-    if not result:
-        raise EconDataError(404, "No data available for given criteria.")
 
-    data = []
-    for row in result:
-        data.append(
-            {
-                "period": row[0],
-                "area": row[1],
-                "industry": row[2],
-                "number": row[3],
-                "one-year change": row[4],
-                "one-year percent change": row[5],
-                "two-year change": row[6],
-                "two-year percent change": row[7],
-            }
+async def get_dashboard_part(spec: str) -> bytes:
+    """
+    Get the response to *spec*, an endpoint's route (relative to /api/econ-data/v1/) with its
+    query string, as a JSON object of its status and either its data or error message.
+    """
+    route, _, query = spec.partition("?")
+    params = dict(parse_qsl(query))
+    try:
+        if route in data_routes:
+            # (the other formats aren't JSON, so can't be included as is)
+            format = params.get("format") or "json"
+            if format not in ["json", "columns"]:
+                message = "Please enter a valid format. Must be one of: json, columns"
+                raise EconDataError(400, message)
+            table = data_routes[route]
+            response = await get_data(
+                table,
+                None if table == "housing" else params.get("area"),
+                int_param(params, "start_year"),
+                int_param(params, "end_year"),
+                format,
+                None,
+                params.get("region") if table == "housing" else None,
+            )
+        elif route in recent_routes:
+            response = await get_recent_matching_data(
+                recent_routes[route], int_param(params, "years")
+            )
+        elif route == "employment-by-industry":
+            response = await get_employment_by_industry()
+        else:
+            raise EconDataError(404, "Unknown series: " + route)
+    except EconDataError as e:
+        return encode({"status": e.status_code, "message": e.message})
+    except db.Error as e:
+        # (reported as this series' error, like any other, rather than failing the whole dashboard)
+        logger.error(f"Error getting {spec} for a dashboard: {e}")
+        error = EconDataError(500, "Database error")
+        return encode({"status": error.status_code, "message": error.message})
+    # (the body is already encoded, and cached, so it's spliced in rather than decoded again)
+    return b'{"status":200,"data":' + response.body + b"}"
+
+
+@app.get(
+    "/api/econ-data/v1/dashboard",
+    response_model=Dict,
+    responses=responses,
+)
+async def dashboard(series: List[str] = Query(...)):
+    """
+    Get several series at once, e.g. for a dashboard. Each *series* is the route of one of the
+    other endpoints, with its query parameters, such as "cpi-recent?years=2" or
+    "housing?region=DVRPC Region (PA)&start_year=2020" (URL-encoded, as a query parameter
+    itself). Only the json and columns formats can be requested.
+
+    The response is an object with a member per series, keyed by the series as given, which holds
+    the status the endpoint would have responded with and either its data or its error message.
+    The series are fetched concurrently, so this takes about as long as the slowest of them.
+    """
+    series = list(dict.fromkeys(series))
+    if len(series) > DASHBOARD_MAX_SERIES:
+        return JSONResponse(
+            status_code=400,
+            content={"message": f"At most {DASHBOARD_MAX_SERIES} series can be requested at once"},
         )
+    parts = await asyncio.gather(*(get_dashboard_part(spec) for spec in series))
+    body = b",".join(encode(spec) + b":" + part for spec, part in zip(series, parts))
+    return cached_response(b"{" + body + b"}")
 
-    # get most recent period and one year before that; data for just those periods
-    most_recent = data[0]["period"]
-    year_ago = date(most_recent.year - 1, most_recent.month, most_recent.day)
-    most_recent_data = [record for record in data if record["period"] == most_recent]
-    year_ago_data = [record for record in data if record["period"] == year_ago]
-
-    # create a var for totals
-    most_recent_total = {}
-    for record in most_recent_data:
-        if record["industry"] == "Total Nonfarm":
-            most_recent_total[record["area"]] = record["number"]
-
-    year_ago_total = {}
-    for record in year_ago_data:
-        if record["industry"] == "Total Nonfarm":
-            year_ago_total[record["area"]] = record["number"]
-
-    # use groupby with itemgetter to reshape the data
-    # <https://www.geeksforgeeks.org/group-list-of-dictionary-data-by-particular-key-in-python/>
-
-    most_recent_data_by_industry = {}
-    for key, value in groupby(most_recent_data, key=itemgetter("industry")):
-        values = list(value)
-        area = {}
-
-        area[values[0]["area"]] = {
-            "employment": values[0]["number"],
-            "share of total": round(
-                (values[0]["number"] / most_recent_total[values[0]["area"]] * 100), 1
-            ),
-            "one-year change (number)": values[0]["one-year change"],
-            "one-year change (percent)": values[0]["one-year percent change"],
-            "two-year change (number)": values[0]["two-year change"],
-            "two-year change (percent)": values[0]["two-year percent change"],
-        }
-        area[values[1]["area"]] = {
-            "employment": values[1]["number"],
-            "share of total": round(
-                (values[1]["number"] / most_recent_total[values[1]["area"]] * 100), 1
-            ),
-            "one-year change (number)": values[1]["one-year change"],
-            "one-year change (percent)": values[1]["one-year percent change"],
-            "two-year change (number)": values[1]["two-year change"],
-            "two-year change (percent)": values[1]["two-year percent change"],
-        }
-        most_recent_data_by_industry[key] = area
-
-    year_ago_data_by_industry = {}
-    for key, value in groupby(year_ago_data, key=itemgetter("industry")):
-        values = list(value)
-        area = {}
-        area[values[0]["area"]] = {
-            "employment": values[0]["number"],
-            "share of total": round(
-                (values[0]["number"] / year_ago_total[values[0]["area"]] * 100), 1
-            ),
-            "one-year change (number)": values[0]["one-year change"],
-            "one-year change (percent)": values[0]["one-year percent change"],
-            "two-year change (number)": values[0]["two-year change"],
-            "two-year change (percent)": values[0]["two-year percent change"],
-        }
-        area[values[1]["area"]] = {
-            "employment": values[1]["number"],
-            "share of total": round(
-                (values[1]["number"] / year_ago_total[values[1]["area"]] * 100), 1
-            ),
-            "one-year change (number)": values[1]["one-year change"],
-            "one-year change (percent)": values[1]["one-year percent change"],
-            "two-year change (number)": values[1]["two-year change"],
-            "two-year change (percent)": values[1]["two-year percent change"],
-        }
-        year_ago_data_by_industry[key] = area
-
-    most_recent_friendly_date = calendar.month_name[most_recent.month] + " " + str(most_recent.year)
-    year_ago_friendly_date = calendar.month_name[year_ago.month] + " " + str(year_ago.year)
-
-    summary_data = {
-        most_recent_friendly_date: most_recent_data_by_industry,
-        year_ago_friendly_date: year_ago_data_by_industry,
-    }
 
-    return summary_data
+@app.get("/api/econ-data/v1/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Get the API's metrics, in Prometheus's text format (see metrics.py)."""
+    return metrics.render()
+
+
+@app.get("/api/econ-data/v1/pool-stats", include_in_schema=False)
+def pool_stats():
+    """Get connection pool statistics (see get_stats() in db.py or snapshot.py)."""
+    return db.get_stats()
 
 
 @app.get(
@@ -409,10 +780,19 @@ def employment_by_industry():
     response_model=List[UnitsResponse],
     responses=responses,
 )
-def housing(start_year: Optional[int] = None, end_year: Optional[int] = None):
-    """Get the total number of new housing units authorized for the DVRPC Region by month."""
+async def housing(
+    region: Optional[str] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    format: Optional[str] = None,
+    stream: Optional[bool] = None,
+):
+    """
+    Get the total number of new housing units authorized by month for the DVRPC Region, or for
+    another region: the DVRPC Region's Pennsylvania or New Jersey counties, or one of its counties.
+    """
     try:
-        data = get_data("housing", None, start_year, end_year)
+        data = await get_data("housing", None, start_year, end_year, format, stream, region)
     except EconDataError as e:
         return JSONResponse(
             status_code=e.status_code,
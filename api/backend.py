@@ -0,0 +1,24 @@
+"""
+The backend the API reads its data from, picked by BACKEND in config.py:
+  * "postgres" (default): the Postgres database at PG_CREDS, through a pool of connections (see
+    db.py)
+  * "snapshot": a read-only SQLite file at SNAPSHOT_PATH, loaded by the data/ scripts (see
+    snapshot.py)
+
+Both provide open_pool(), close_pool(), fetch_all(), stream() and get_stats(), and Error and
+OperationalError (the base classes of the exceptions they raise), and return the same rows for
+the same queries. Import the one in use with `from backend import db`.
+"""
+
+import config
+
+__all__ = ["BACKEND", "db"]
+
+BACKEND = getattr(config, "BACKEND", "postgres")
+
+if BACKEND == "postgres":
+    import db
+elif BACKEND == "snapshot":
+    import snapshot as db
+else:
+    raise ValueError("BACKEND must be either 'postgres' or 'snapshot'")
@@ -0,0 +1,96 @@
+"""
+In-process cache of encoded API responses.
+
+The data only changes when one of the data/ loaders commits new or revised rows, and when it does,
+the loader bumps the table's version in the data_version table. Each worker polls data_version
+every VERSION_POLL_INTERVAL seconds and only serves a cached response while the version it was
+built from is still current, so repeated queries are answered from memory rather than the
+database. CACHE_TTL is a backstop in case a table is changed without its version being bumped.
+"""
+
+import asyncio
+from collections import OrderedDict, namedtuple
+import logging
+import time
+
+import config
+
+from backend import db
+
+CACHE_MAX_ENTRIES = getattr(config, "CACHE_MAX_ENTRIES", 1024)
+CACHE_TTL = getattr(config, "CACHE_TTL", 3600)
+VERSION_POLL_INTERVAL = getattr(config, "VERSION_POLL_INTERVAL", 30)
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """A bounded LRU cache of response bodies, tagged with the data version they were built from."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, version):
+        """Get the body cached under *key*, or None if it's missing, expired or out of date."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: tuple, version, body: bytes):
+        self.entries[key] = (version, time.monotonic() + self.ttl, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+response_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+
+DataVersion = namedtuple("DataVersion", ["version", "updated_at", "max_period"])
+
+# table name: DataVersion, as last read from the data_version table
+data_versions = {}
+
+# the regions housing can be totaled for, as last read from the region_county table
+# (they change no more often than the data, so they're read along with its versions)
+regions = []
+
+_poller = None
+
+
+async def refresh_versions():
+    result = await db.fetch_all(
+        "SELECT table_name, version, updated_at, max_period FROM data_version"
+    )
+    data_versions.clear()
+    for row in result:
+        data_versions[row[0]] = DataVersion(*row[1:])
+
+    result = await db.fetch_all("SELECT DISTINCT region FROM region_county ORDER BY region")
+    regions[:] = [row[0] for row in result]
+
+
+async def poll_versions():
+    while True:
+        try:
+            await refresh_versions()
+        except db.Error as e:
+            logger.warning(f"Unable to refresh data versions: {e}")
+        await asyncio.sleep(VERSION_POLL_INTERVAL)
+
+
+def start_polling():
+    global _poller
+    _poller = asyncio.create_task(poll_versions())
+
+
+def stop_polling():
+    if _poller:
+        _poller.cancel()
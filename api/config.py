@@ -0,0 +1 @@
+PG_CREDS = "postgresql://postgres:@/econ_data?host=/tmp/pgdata"
@@ -0,0 +1,128 @@
+"""
+Shared Postgres connection pool for the API (its default backend; see backend.py).
+
+The pool is opened when the app starts up and closed when it shuts down, so each request borrows
+an already-established connection rather than connecting (and authenticating) on its own.
+
+DB_MODE in config.py picks how queries are run:
+  * "sync" (default): a ConnectionPool of blocking connections; each query runs in Starlette's
+    threadpool, so the number of queries in flight is limited by the size of that threadpool.
+  * "async": an AsyncConnectionPool of AsyncConnections; queries are awaited on the event loop,
+    so a single worker can keep many of them in flight at once.
+
+The pool can be tuned with optional variables in config.py; see README.md.
+"""
+
+import time
+
+import config
+import psycopg
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+DB_MODE = getattr(config, "DB_MODE", "sync")
+POOL_MIN_SIZE = getattr(config, "POOL_MIN_SIZE", 2)
+POOL_MAX_SIZE = getattr(config, "POOL_MAX_SIZE", 10)
+# seconds to wait for a free connection before giving up (the API then responds with a 503)
+POOL_TIMEOUT = getattr(config, "POOL_TIMEOUT", 5.0)
+# seconds an idle connection above POOL_MIN_SIZE is kept before being closed
+POOL_MAX_IDLE = getattr(config, "POOL_MAX_IDLE", 600.0)
+# rows fetched at a time by stream()
+STREAM_BATCH_SIZE = getattr(config, "STREAM_BATCH_SIZE", 1000)
+
+# (the base classes of the exceptions raised here)
+Error = psycopg.Error
+OperationalError = psycopg.OperationalError
+
+if DB_MODE not in ["sync", "async"]:
+    raise ValueError("DB_MODE must be either 'sync' or 'async'")
+
+pool_class = AsyncConnectionPool if DB_MODE == "async" else ConnectionPool
+
+pool = pool_class(
+    config.PG_CREDS,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    timeout=POOL_TIMEOUT,
+    max_idle=POOL_MAX_IDLE,
+    # make sure a connection is still alive before handing it out
+    check=pool_class.check_connection,
+    name="econ-data",
+    open=False,
+)
+
+
+async def open_pool():
+    if DB_MODE == "async":
+        await pool.open()
+    else:
+        pool.open()
+
+
+async def close_pool():
+    if DB_MODE == "async":
+        await pool.close()
+    else:
+        pool.close()
+
+
+def get_stats() -> dict:
+    """Get the pool's statistics (see psycopg_pool's ConnectionPool.get_stats())."""
+    return pool.get_stats()
+
+
+def _fetch_all_sync(query: str, params, prepare) -> list:
+    start = time.perf_counter()
+    with pool.connection() as conn:
+        metrics.POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        return conn.execute(query, params, prepare=prepare).fetchall()
+
+
+async def fetch_all(query: str, params=None, prepare: bool = None) -> list:
+    """
+    Run *query* with *params* on a pooled connection and return all rows.
+
+    With *prepare*, the query is prepared on the connection the first time it's run there, and the
+    prepared statement is reused for every later run on that connection. (Since connections are
+    pooled, that's most of them.)
+    """
+    if DB_MODE == "async":
+        start = time.perf_counter()
+        async with pool.connection() as conn:
+            metrics.POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+            cur = await conn.execute(query, params, prepare=prepare)
+            return await cur.fetchall()
+    return await run_in_threadpool(_fetch_all_sync, query, params, prepare)
+
+
+def _stream_sync(query: str, params, batch_size: int):
+    with pool.connection() as conn:
+        with conn.cursor(name="stream") as cur:
+            cur.execute(query, params)
+            while batch := cur.fetchmany(batch_size):
+                yield batch
+
+
+async def stream(query: str, params=None, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Run *query* with *params* on a pooled connection and yield its rows *batch_size* at a time.
+
+    The rows are read through a server-side (named) cursor, so only one batch is held in memory
+    at once. The connection is held until the generator is exhausted or closed.
+    """
+    if DB_MODE == "async":
+        async with pool.connection() as conn:
+            async with conn.cursor(name="stream") as cur:
+                await cur.execute(query, params)
+                while batch := await cur.fetchmany(batch_size):
+                    yield batch
+        return
+
+    batches = _stream_sync(query, params, batch_size)
+    try:
+        while batch := await run_in_threadpool(next, batches, None):
+            yield batch
+    finally:
+        await run_in_threadpool(batches.close)
@@ -0,0 +1,243 @@
+"""
+Export the API's responses as static files, so that nginx or a CDN can serve them without the API.
+
+    python export.py DIRECTORY [--full] [--jobs N] [--brotli-quality N]
+
+Every combination of parameters that has data is exported: each area (or for housing, region)
+and none, each start and end year from the first to the last year of the table's data and none,
+and each format; each number of years of recent data, until more years add nothing; and the
+employment by industry summary. Each response body is written to a path under DIRECTORY built
+from its route and parameters, with "_" for a parameter that isn't given, and areas and regions
+percent-encoded:
+
+    api/econ-data/v1/{cpi,unemployment,housing}/{area or region}/{start_year}-{end_year}.{format}
+    api/econ-data/v1/{cpi,unemployment}-recent/{years}.json
+    api/econ-data/v1/employment-by-industry/_.json
+
+along with gzip-compressed (.gz) and, if the brotli package is installed, brotli-compressed (.br)
+copies, for nginx's gzip_static and brotli_static. Requests for anything else (e.g. years outside
+the data) can be passed on to the API; see README.md for an nginx configuration that does so.
+
+Exports are incremental. The version of each table's data (see cache.py) is recorded in
+DIRECTORY/versions.json, and only the routes of tables whose version has changed since the last
+export are exported again (or all of them, with --full). Of those, only files whose content has
+changed are rewritten, and files for parameters that no longer have data are removed; each file
+is replaced atomically, so they can be served while an export runs.
+
+The data is read through the backend set in config.py (see backend.py), and the bodies are built
+by the API's own encoders, so they're identical to its responses. Rather than running a query for
+every combination, each area's rows are read once and then sliced by year.
+"""
+
+import argparse
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import json
+import os
+from pathlib import Path
+import time
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from backend import db
+import app
+import cache
+
+prefix = Path("api/econ-data/v1")
+
+# table: route of its endpoint served by get_data()
+data_routes = {"cpi": "cpi", "unemployment_rate": "unemployment", "housing": "housing"}
+# table: route of its endpoint served by get_recent_matching_data()
+recent_routes = {"cpi": "cpi-recent", "unemployment_rate": "unemployment-recent"}
+
+
+def segment(value) -> str:
+    """Get the part of a path for a parameter's *value* ("_" if it isn't given)."""
+    return "_" if value is None else quote(str(value), safe="")
+
+
+class Export:
+    """Files written to a directory, compressed in a pool of threads."""
+
+    def __init__(self, directory: Path, jobs: int, brotli_quality: int):
+        self.directory = directory
+        self.brotli_quality = brotli_quality
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        # (at most this many files are waiting to be written, so that their bodies don't pile up
+        # in memory while they're compressed)
+        self.max_pending = jobs * 4
+        self.pending = deque()
+        self.written = 0
+        # paths (relative to directory) of the files exported, without their compressed copies
+        self.paths = set()
+
+    def variants(self, path: Path) -> list:
+        """Get the file for *path* and its compressed copies."""
+        path = self.directory / path
+        suffixes = [".gz", ".br"] if brotli else [".gz"]
+        return [path] + [path.with_name(path.name + suffix) for suffix in suffixes]
+
+    def add(self, path: Path, body: bytes):
+        """Write *body* to *path* (and its compressed copies), unless it's already there."""
+        self.paths.add(path)
+        files = self.variants(path)
+        try:
+            if files[0].read_bytes() == body and all(file.exists() for file in files[1:]):
+                return
+        except FileNotFoundError:
+            pass
+        self.pending.append(self.executor.submit(self.write, files, body))
+        self.written += 1
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+
+    def write(self, files: list, body: bytes):
+        files[0].parent.mkdir(parents=True, exist_ok=True)
+        contents = [body, gzip.compress(body, compresslevel=9, mtime=0)]
+        if brotli:
+            contents.append(brotli.compress(body, quality=self.brotli_quality))
+        # (the uncompressed file last, since it's what's compared with on the next export)
+        for file, content in reversed(list(zip(files, contents))):
+            tmp = file.with_name(file.name + ".tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, file)
+
+    def finish(self, routes: list) -> int:
+        """
+        Wait for all files to be written, and then remove any others under *routes*; return the
+        number of files removed.
+        """
+        while self.pending:
+            self.pending.popleft().result()
+        self.executor.shutdown()
+
+        keep = {file for path in self.paths for file in self.variants(path)}
+        removed = 0
+        for route in routes:
+            for file in sorted((self.directory / prefix / route).rglob("*"), reverse=True):
+                if file.is_dir():
+                    if not any(file.iterdir()):
+                        file.rmdir()
+                elif file not in keep:
+                    file.unlink()
+                    removed += 1
+        return removed
+
+
+async def export_data(export: Export, table: str):
+    """Export every combination of area (or region), years and format for *table*."""
+    route = data_routes[table]
+    parameter, values = ("region", cache.regions) if table == "housing" else ("area", app.areas)
+    for value in [None, *values]:
+        query, params = app.data_query(table, **{parameter: value})
+        rows = await app.query_db(table, query, params)
+        if not rows:
+            continue
+        area_dir = prefix / route / segment(value)
+        # (rows are in order of period, so each range of years is a slice of them)
+        years = [row[0].year for row in rows]
+        for start_year in [None, *range(years[0], years[-1] + 1)]:
+            for end_year in [None, *range(start_year or years[0], years[-1] + 1)]:
+                first = bisect_left(years, start_year) if start_year else 0
+                last = bisect_right(years, end_year) if end_year else len(rows)
+                if first == last:
+                    continue
+                name = f"{segment(start_year)}-{segment(end_year)}"
+                for format, (_, encoder) in app.formats.items():
+                    body = encoder(table, rows[first:last])
+                    export.add(area_dir / f"{name}.{format}", body)
+
+
+async def export_recent(export: Export, table: str):
+    """Export each number of years of *table*'s recent data, until more years add nothing."""
+    route_dir = prefix / recent_routes[table]
+    previous = None
+    years = 1
+    while True:
+        try:
+            body = (await app.get_recent_matching_data(table, years)).body
+        except app.EconDataError:
+            return
+        if body == previous:
+            return
+        if years == 1:
+            export.add(route_dir / "_.json", body)
+        export.add(route_dir / f"{years}.json", body)
+        previous = body
+        years += 1
+
+
+async def export_employment_by_industry(export: Export, table: str):
+    response = await app.employment_by_industry()
+    if response.status_code == 200:
+        export.add(prefix / "employment-by-industry" / "_.json", response.body)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=Path, help="directory to export to")
+    parser.add_argument("--full", action="store_true", help="export every table's routes")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="threads compressing")
+    # (11, the highest, is some 40 times slower than 9, for files only a few percent smaller)
+    parser.add_argument("--brotli-quality", type=int, default=9)
+    args = parser.parse_args()
+    if not brotli:
+        print("brotli isn't installed, so only gzip-compressed copies will be written")
+
+    versions_path = args.directory / "versions.json"
+    try:
+        exported_versions = json.loads(versions_path.read_text())
+    except FileNotFoundError:
+        exported_versions = {}
+
+    await db.open_pool()
+    try:
+        await cache.refresh_versions()
+        versions = {table: version.version for table, version in cache.data_versions.items()}
+
+        # table: functions exporting its routes, and the routes
+        exports = {
+            "cpi": [(export_data, data_routes["cpi"]), (export_recent, recent_routes["cpi"])],
+            "unemployment_rate": [
+                (export_data, data_routes["unemployment_rate"]),
+                (export_recent, recent_routes["unemployment_rate"]),
+            ],
+            "housing": [(export_data, data_routes["housing"])],
+            "employment_by_industry": [
+                (export_employment_by_industry, "employment-by-industry"),
+            ],
+        }
+        for table, table_exports in exports.items():
+            if table not in versions:
+                print(f"{table}: no data")
+                continue
+            if not args.full and exported_versions.get(table) == versions[table]:
+                print(f"{table}: unchanged since the last export")
+                continue
+
+            start = time.perf_counter()
+            export = Export(args.directory, args.jobs, args.brotli_quality)
+            for f, _ in table_exports:
+                await f(export, table)
+            removed = export.finish([route for _, route in table_exports])
+            print(
+                f"{table}: {len(export.paths)} responses, {export.written} written, "
+                f"{len(export.paths) - export.written} unchanged, {removed} files removed, "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+            exported_versions[table] = versions[table]
+            args.directory.mkdir(parents=True, exist_ok=True)
+            versions_path.write_text(json.dumps(exported_versions, indent=2))
+    finally:
+        await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
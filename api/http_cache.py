@@ -0,0 +1,152 @@
+"""
+HTTP caching headers for the data endpoints.
+
+Every successful response carries an ETag and a Last-Modified header derived from the version of
+the table(s) behind it (see cache.py), and a Cache-Control max-age that runs until the next time
+new data is expected to be released. Conditional requests (If-None-Match/If-Modified-Since) for
+a current copy are answered with a 304, but only if the query succeeds: if its ETag (which covers
+the query and the versions) was recently sent with a 200, straight from the in-memory versions,
+without running the route at all, and otherwise once the route has returned a 200.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+
+import config
+from fastapi import Request
+from fastapi.responses import Response
+
+import cache
+
+# Days of the month on which new data for each table is typically published: BLS releases the
+# CPI around mid-month, national unemployment (CPS) early in the month, metro unemployment
+# (LAUS) and employment (CES) late in the month, and Census releases county permits around the
+# 17th. Responses can be cached until the next of these days (at RELEASE_HOUR UTC).
+RELEASE_DAYS = getattr(
+    config,
+    "RELEASE_DAYS",
+    {
+        "cpi": [10],
+        "unemployment_rate": [3, 28],
+        "employment_by_industry": [28],
+        "housing": [17],
+    },
+)
+RELEASE_HOUR = getattr(config, "RELEASE_HOUR", 12)
+# max-age (in seconds) used once a release is due but hasn't been loaded into the database yet
+PENDING_MAX_AGE = getattr(config, "PENDING_MAX_AGE", 3600)
+
+# path: tables its responses are built from
+route_tables = {
+    "/api/econ-data/v1/unemployment": ["unemployment_rate"],
+    "/api/econ-data/v1/cpi": ["cpi"],
+    "/api/econ-data/v1/unemployment-recent": ["unemployment_rate"],
+    "/api/econ-data/v1/cpi-recent": ["cpi"],
+    "/api/econ-data/v1/employment-by-industry": ["employment_by_industry"],
+    "/api/econ-data/v1/housing": ["housing"],
+    # (a dashboard can include any of them, so its headers are derived from them all)
+    "/api/econ-data/v1/dashboard": [
+        "cpi",
+        "unemployment_rate",
+        "employment_by_industry",
+        "housing",
+    ],
+}
+
+
+# ETags sent with a 200 response, least recently used first (as many as there are cached responses)
+known_etags = OrderedDict()
+
+
+def release_dates(days: list, now: datetime) -> list:
+    """Get the release dates in *days* for the months before, of, and after *now*."""
+    dates = []
+    for months in [-1, 0, 1]:
+        year, month = divmod(now.year * 12 + now.month - 1 + months, 12)
+        for day in days:
+            dates.append(datetime(year, month + 1, day, RELEASE_HOUR, tzinfo=timezone.utc))
+    return dates
+
+
+def max_age(tables: list, now: datetime) -> int:
+    """
+    Get the number of seconds until new data is expected for any of *tables*.
+
+    If a release has come and gone without the table being updated since, the data is due to
+    change at any moment, so only PENDING_MAX_AGE is allowed.
+    """
+    seconds = []
+    for table in tables:
+        dates = release_dates(RELEASE_DAYS[table], now)
+        last_release = max(date for date in dates if date <= now)
+        if cache.data_versions[table].updated_at < last_release:
+            seconds.append(PENDING_MAX_AGE)
+        else:
+            next_release = min(date for date in dates if date > now)
+            seconds.append((next_release - now).total_seconds())
+    return int(min(seconds))
+
+
+def validators(request: Request, tables: list) -> dict:
+    """Create the ETag, Last-Modified and Cache-Control headers for a response to *request*."""
+    versions = [cache.data_versions[table] for table in tables]
+    tag = hashlib.sha1(str(request.url.path).encode())
+    tag.update(str(request.url.query).encode())
+    for table, version in zip(tables, versions):
+        tag.update(f"{table}:{version.version}:{version.max_period}".encode())
+    last_modified = max(version.updated_at for version in versions)
+
+    return {
+        "ETag": '"' + tag.hexdigest()[:20] + '"',
+        "Last-Modified": format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "public, max-age=" + str(max_age(tables, datetime.now(timezone.utc))),
+    }
+
+
+def not_modified(request: Request, headers: dict) -> bool:
+    """Determine if the client's copy (per its conditional request headers) is still current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return headers["ETag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Last-Modified only has a resolution of seconds
+        last_modified = parsedate_to_datetime(headers["Last-Modified"])
+        return since.tzinfo is not None and last_modified <= since
+
+    return False
+
+
+async def http_caching(request: Request, call_next):
+    tables = route_tables.get(request.url.path)
+
+    # without a version for every table, there's nothing to derive the headers from
+    if request.method != "GET" or not tables or any(t not in cache.data_versions for t in tables):
+        return await call_next(request)
+
+    headers = validators(request, tables)
+    etag = headers["ETag"]
+    current = not_modified(request, headers)
+    if current and etag in known_etags:
+        known_etags.move_to_end(etag)
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    known_etags[etag] = None
+    known_etags.move_to_end(etag)
+    if len(known_etags) > cache.CACHE_MAX_ENTRIES:
+        known_etags.popitem(last=False)
+    if current:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
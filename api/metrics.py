@@ -0,0 +1,87 @@
+"""
+Prometheus metrics for the API, served at /api/econ-data/v1/metrics.
+
+  * econ_data_requests_in_flight: requests being handled
+  * econ_data_request_seconds{route, status}: time to respond to requests (for streamed
+    responses, until the first batch is ready to send)
+  * econ_data_pool_wait_seconds: time spent waiting for a pooled connection
+  * econ_data_query_seconds{table}: time to run a query and fetch its rows, including any wait
+    for a connection
+  * econ_data_query_rows_total{table}: rows returned by queries
+  * econ_data_encode_seconds{format}: time to build a response body from the rows
+  * econ_data_errors_total{status}: error (4xx and 5xx) responses, by status code
+
+Each worker process has its own metrics. When running several (e.g. under gunicorn), set the
+PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory, and they're combined across
+workers; see README.md.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+IN_FLIGHT = Gauge(
+    "econ_data_requests_in_flight", "Requests being handled", multiprocess_mode="livesum"
+)
+REQUEST_SECONDS = Histogram(
+    "econ_data_request_seconds", "Time to respond to requests", ["route", "status"]
+)
+POOL_WAIT_SECONDS = Histogram(
+    "econ_data_pool_wait_seconds", "Time spent waiting for a pooled connection"
+)
+QUERY_SECONDS = Histogram(
+    "econ_data_query_seconds", "Time to run a query and fetch its rows", ["table"]
+)
+QUERY_ROWS = Counter("econ_data_query_rows", "Rows returned by queries", ["table"])
+ENCODE_SECONDS = Histogram(
+    "econ_data_encode_seconds", "Time to build a response body from the rows", ["format"]
+)
+ERRORS = Counter("econ_data_errors", "Error responses, by status code", ["status"])
+
+
+def route(request: Request) -> str:
+    """Get the path of the route that handles *request*, or "other" if none does."""
+    # (so that requests for arbitrary paths don't each add a label to the metrics)
+    for each in request.app.routes:
+        if each.path == request.url.path:
+            return each.path
+    return "other"
+
+
+async def track_requests(request: Request, call_next):
+    IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        REQUEST_SECONDS.labels(route(request), status).observe(time.perf_counter() - start)
+        # (counted as they're sent, so errors within a dashboard's 200 response aren't)
+        if status >= 400:
+            ERRORS.labels(status).inc()
+
+
+def render() -> Response:
+    """Create a response with the current value of every metric, in Prometheus's text format."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    # (the content type is set as a header, so Starlette doesn't add a second charset to it)
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
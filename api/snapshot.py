@@ -0,0 +1,166 @@
+"""
+Read-only SQLite backend for the API, used when BACKEND = "snapshot" in config.py.
+
+A snapshot is a SQLite file with the same tables as the database, loaded by the data/ scripts
+(see data/snapshot.py), so the API can be served from a file rather than a Postgres server. This
+provides the same functions as db.py and returns the same rows for the same queries: they're
+written for Postgres, and translated for SQLite by translate().
+
+Connections are opened read-only when first needed, and then kept for the life of the worker and
+reused, one query at a time each. Queries run in Starlette's threadpool, as in db.py's "sync" mode.
+The file is in WAL mode, so the data/ scripts can load it while it's being read, and the API sees
+each load once it's been committed.
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+import re
+import sqlite3
+
+import config
+from starlette.concurrency import run_in_threadpool
+
+SNAPSHOT_PATH = getattr(config, "SNAPSHOT_PATH", "econ_data.sqlite")
+# rows fetched at a time by stream()
+STREAM_BATCH_SIZE = getattr(config, "STREAM_BATCH_SIZE", 1000)
+
+# (the base classes of the exceptions raised here, as in db.py)
+Error = sqlite3.Error
+OperationalError = sqlite3.OperationalError
+
+# (dates are stored as ISO 8601 text)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: bool(int(value)))
+
+# columns of the database's enum types: their type (as recorded in enum_value)
+enum_columns = {"area": "geographic_area", "industry": "industry_group"}
+# an ORDER BY clause (and its columns), and each column in it (with its direction)
+order_by = re.compile(r"(ORDER BY\s+)(\w+(?:\s+(?:ASC|DESC))?(?:\s*,\s*\w+(?:\s+(?:ASC|DESC))?)*)")
+order_column = re.compile(r"(\w+)(\s+(?:ASC|DESC))?")
+
+# values of the enum types, in order (read from enum_value when connecting)
+enums = {}
+
+# connections not in use, and the number opened
+idle = []
+opened = 0
+
+
+def literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def sort_key(match) -> str:
+    column, direction = match.group(1), match.group(2) or ""
+    values = enums.get(enum_columns.get(column))
+    if not values:
+        return match.group()
+    # (a CASE rather than a lookup in enum_value for each row, which is a good deal slower for
+    # large results; any other values sort after them)
+    cases = " ".join(f"WHEN {literal(value)} THEN {i}" for i, value in enumerate(values))
+    return f"CASE {column} {cases} ELSE {len(values)} END{direction}"
+
+
+@lru_cache(maxsize=None)
+def translate(query: str) -> str:
+    """
+    Translate *query*, written for Postgres, for SQLite: %s placeholders become ?, and enum columns
+    in ORDER BY clauses are sorted by the position of their values in the enum (as recorded in
+    enum_value), as Postgres sorts them, rather than alphabetically.
+    """
+    query = order_by.sub(
+        lambda match: match.group(1) + order_column.sub(sort_key, match.group(2)), query
+    )
+    return query.replace("%s", "?")
+
+
+def connect() -> sqlite3.Connection:
+    global opened
+    conn = sqlite3.connect(
+        Path(SNAPSHOT_PATH).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        # (each is only used by one thread at a time, but not always the same one)
+        check_same_thread=False,
+    )
+    values = {}
+    for type_name, value in conn.execute(
+        "SELECT type_name, value FROM enum_value ORDER BY type_name, sort_order"
+    ):
+        values.setdefault(type_name, []).append(value)
+    enums.update(values)
+    opened += 1
+    return conn
+
+
+@contextmanager
+def connection():
+    """Borrow an idle connection, or open a new one if there are none."""
+    try:
+        conn = idle.pop()
+    except IndexError:
+        conn = connect()
+    try:
+        yield conn
+    finally:
+        idle.append(conn)
+
+
+async def open_pool():
+    # (a first connection is opened at startup, so that a missing or unreadable snapshot is
+    # reported then rather than by the first request)
+    idle.append(connect())
+
+
+async def close_pool():
+    global opened
+    while idle:
+        idle.pop().close()
+        opened -= 1
+
+
+def get_stats() -> dict:
+    """Get the number of connections open and idle (named as in psycopg_pool's get_stats())."""
+    return {"pool_size": opened, "pool_available": len(idle)}
+
+
+def _fetch_all_sync(query: str, params) -> list:
+    with connection() as conn:
+        return conn.execute(translate(query), params or ()).fetchall()
+
+
+async def fetch_all(query: str, params=None, prepare: bool = None) -> list:
+    """
+    Run *query* with *params* on a connection to the snapshot and return all rows.
+
+    (*prepare* is accepted for db.py's sake; SQLite keeps each connection's recently used
+    statements prepared anyway.)
+    """
+    return await run_in_threadpool(_fetch_all_sync, query, params)
+
+
+def _stream_sync(query: str, params, batch_size: int):
+    with connection() as conn:
+        cur = conn.execute(translate(query), params or ())
+        try:
+            while batch := cur.fetchmany(batch_size):
+                yield batch
+        finally:
+            cur.close()
+
+
+async def stream(query: str, params=None, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Run *query* with *params* on a connection to the snapshot and yield its rows *batch_size* at
+    a time. The connection is held until the generator is exhausted or closed.
+    """
+    batches = _stream_sync(query, params, batch_size)
+    try:
+        while batch := await run_in_threadpool(next, batches, None):
+            yield batch
+    finally:
+        await run_in_threadpool(batches.close)
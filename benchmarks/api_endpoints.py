@@ -0,0 +1,134 @@
+"""
+Measure the latency and throughput of the API's endpoints against a local Postgres database, or a
+snapshot.
+
+    python benchmarks/api_endpoints.py (DSN | --snapshot PATH) [--requests N] [--concurrency N]
+        [--save PATH] [--compare PATH]
+
+DSN is the database to query, typically one filled by synthetic.py; with --snapshot, the API
+instead reads the snapshot at PATH (see api/snapshot.py). For each endpoint, requests
+are sent one at a time with the response cache disabled (p50/p95, so each one queries the
+database) and enabled (cached p50), and then --concurrency at a time with it disabled (requests
+per second). Requests go straight to the app (through httpx's ASGI transport), so the times
+include the app and the database, but not a server or network.
+
+It imports app.py, so api/config.py needs to exist, but its PG_CREDS (or BACKEND and
+SNAPSHOT_PATH) are replaced. With
+--save, the results are saved as a baseline (see baseline.py); with --compare, they're compared
+with one saved earlier.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+import config
+
+parser = argparse.ArgumentParser()
+parser.add_argument("dsn", nargs="?", help="connection string of the database to query")
+parser.add_argument("--snapshot", help="query the snapshot at this path instead")
+parser.add_argument("--requests", type=int, default=50)
+parser.add_argument("--concurrency", type=int, default=8)
+parser.add_argument("--save", help="save the results as a baseline to this file")
+parser.add_argument("--compare", help="compare the results with the baseline in this file")
+args = parser.parse_args()
+if not (args.dsn or args.snapshot):
+    parser.error("either DSN or --snapshot is required")
+
+# (before db.py creates its pool from it)
+config.PG_CREDS = args.dsn
+if args.snapshot:
+    config.BACKEND = "snapshot"
+    config.SNAPSHOT_PATH = args.snapshot
+
+import httpx
+
+import app
+import baseline
+import cache
+
+endpoints = {
+    "cpi": "/api/econ-data/v1/cpi",
+    "cpi (area)": "/api/econ-data/v1/cpi?area=United States",
+    "cpi (10 years)": "/api/econ-data/v1/cpi?start_year=2010&end_year=2019",
+    "cpi (csv)": "/api/econ-data/v1/cpi?format=csv",
+    "cpi (stream)": "/api/econ-data/v1/cpi?stream=true",
+    "cpi-recent": "/api/econ-data/v1/cpi-recent?years=5",
+    "unemployment": "/api/econ-data/v1/unemployment",
+    "unemployment-recent": "/api/econ-data/v1/unemployment-recent?years=5",
+    "employment-by-industry": "/api/econ-data/v1/employment-by-industry",
+    "housing": "/api/econ-data/v1/housing",
+    "housing (region)": "/api/econ-data/v1/housing?region=DVRPC Region (PA)",
+    "dashboard": "/api/econ-data/v1/dashboard?series=cpi-recent%3Fyears%3D2"
+    "&series=unemployment-recent%3Fyears%3D2&series=employment-by-industry"
+    "&series=housing%3Fregion%3DDVRPC%20Region%20(PA)",
+}
+
+
+async def timed_get(client, url: str) -> float:
+    start = time.perf_counter()
+    r = await client.get(url)
+    elapsed = time.perf_counter() - start
+    if r.status_code != 200:
+        sys.exit(f"{url}: {r.status_code} {r.text[:200]}")
+    return elapsed
+
+
+async def sequential(client, url: str, n: int) -> list:
+    return [await timed_get(client, url) for _ in range(n)]
+
+
+async def concurrent(client, url: str, n: int, concurrency: int) -> float:
+    """Send *n* requests for *url*, *concurrency* at a time, and return the requests per second."""
+    remaining = iter(range(n))
+
+    async def worker():
+        for _ in remaining:
+            await timed_get(client, url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return n / (time.perf_counter() - start)
+
+
+def percentile(times: list, p: int) -> float:
+    return statistics.quantiles(times, n=100)[p - 1] * 1000
+
+
+async def main():
+    await app.startup()
+    await cache.refresh_versions()
+    transport = httpx.ASGITransport(app=app.app)
+    results = {}
+    max_entries = cache.response_cache.max_entries
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, url in endpoints.items():
+            # (with no room in the cache, every response is built from the database)
+            cache.response_cache.max_entries = 0
+            await timed_get(client, url)
+            uncached = await sequential(client, url, args.requests)
+            throughput = await concurrent(client, url, args.requests, args.concurrency)
+            cache.response_cache.max_entries = max_entries
+            await timed_get(client, url)
+            cached = await sequential(client, url, args.requests)
+            size = len((await client.get(url)).content)
+            results[name] = {
+                "p50 (ms)": percentile(uncached, 50),
+                "p95 (ms)": percentile(uncached, 95),
+                "cached p50 (ms)": percentile(cached, 50),
+                "req/s": throughput,
+                "KB": size / 1024,
+            }
+    await app.shutdown()
+
+    baseline.report(results, baseline.load(args.compare) if args.compare else None)
+    if args.save:
+        baseline.save(args.save, results)
+
+
+asyncio.run(main())
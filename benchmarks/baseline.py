@@ -0,0 +1,57 @@
+"""
+Report benchmark results, and save them as a baseline to compare later runs against.
+
+Results are a dict of {name: {metric: value}} (e.g. {"cpi": {"p50 (ms)": 1.2, ...}}); a baseline
+is the same, saved as JSON along with when and where it was made.
+"""
+
+from datetime import datetime, timezone
+import json
+import platform
+
+
+def save(path: str, results: dict):
+    baseline = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def report(results: dict, baseline: dict = None):
+    """
+    Print *results* as a table, with the change in each metric since *baseline* (as returned by
+    load()), if given.
+    """
+    metrics = list(next(iter(results.values())))
+    name_width = max(len(name) for name in results) + 2
+    width = max(len(metric) for metric in metrics) + 2
+    if baseline:
+        print(f"(compared with the baseline of {baseline['created']} on {baseline['machine']})")
+        width += 9
+
+    print(f"{'':<{name_width}}" + "".join(f"{metric:>{width}}" for metric in metrics))
+    for name, values in results.items():
+        row = f"{name:<{name_width}}"
+        for metric in metrics:
+            value = values.get(metric)
+            if value is None:
+                cell = "-"
+            else:
+                cell = f"{value:,.2f}" if abs(value) >= 1 else f"{value:.3g}"
+            if baseline:
+                before = baseline["results"].get(name, {}).get(metric)
+                if value is not None and before:
+                    cell += f" ({(value - before) / before:+.0%})".rjust(8)
+                else:
+                    cell += " " * 8
+            row += f"{cell:>{width}}"
+        print(row)
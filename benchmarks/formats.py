@@ -0,0 +1,56 @@
+"""
+Compare the size and encoding time of the response formats offered by get_data().
+
+Each format is encoded from the same synthetic rows; sizes are given both as sent and gzipped
+(as most clients will receive them through a CDN or proxy).
+
+It imports app.py, so api/config.py needs to exist, but no database is used:
+
+    python benchmarks/formats.py [--rows N] [--repeat N]
+"""
+
+import argparse
+from datetime import date
+import gzip
+from pathlib import Path
+import random
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from app import formats
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=10000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+areas = ["United States", "Philadelphia MSA", "Trenton MSA"]
+
+
+def synthetic_rows(table: str, n: int) -> list:
+    """Create *n* rows shaped like those of *table* (including its preliminary column)."""
+    rows = []
+    for i in range(n):
+        period = date(1950 + i // 36 % 8000, i // 3 % 12 + 1, 1)
+        area = areas[i % 3]
+        if table == "cpi":
+            rows.append((period, area, round(random.uniform(20, 320), 3), 2.5, False))
+        elif table == "unemployment_rate":
+            rows.append((period, area, round(random.uniform(2, 12), 1), False))
+        else:
+            rows.append((period, random.randint(0, 5000)))
+    return rows
+
+
+print(f"{'table':<20}{'format':<10}{'bytes':>12}{'gzipped':>12}{'encode (ms)':>14}")
+for table in ["cpi", "unemployment_rate", "housing"]:
+    rows = synthetic_rows(table, args.rows)
+    for format, (_, encoder) in formats.items():
+        body = encoder(table, rows)
+        best = min(timeit.repeat(lambda: encoder(table, rows), number=1, repeat=args.repeat))
+        print(
+            f"{table:<20}{format:<10}{len(body):>12,}{len(gzip.compress(body)):>12,}"
+            f"{best * 1000:>14.2f}"
+        )
@@ -0,0 +1,90 @@
+"""
+Time housing.py's download of the Census county permit files at different concurrency levels.
+
+A local HTTP server stands in for www2.census.gov: it serves a directory listing and FILES
+synthetic county files (each with a line for every county in the country, like the real ones),
+waiting --latency seconds before each response to mimic the round trip. The totals are checked
+to be the same at every concurrency level.
+
+No database or network is used (and so data/config.py isn't needed):
+
+    python benchmarks/housing_downloads.py [--latency S] [--concurrency N ...]
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+
+import fetch
+import housing
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--latency", type=float, default=0.1)
+parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+args = parser.parse_args()
+
+FILES = 36
+COUNTIES = 3200
+
+
+def county_file(month: str) -> bytes:
+    """Create a county file for *month* (YYYYMM), including the DVRPC counties."""
+    lines = ["Survey,FIPS,FIPS,Region,Division,County,,1-unit", "Date,State,County", ""]
+    counties = [(c[:2], c[2:]) for c in sorted(housing.dvrpc_counties)]
+    counties += [(f"{i // 100 + 1:02}", f"{i % 100 * 2 + 1:03}") for i in range(COUNTIES)]
+    r = random.Random(month)
+    for state, county in counties:
+        units = ",".join(f"1,{r.randint(0, 300)},{r.randint(0, 99999)}" for _ in range(4))
+        lines.append(f"{month},{state},{county},1,2,Some County,{units}")
+    return "\n".join(lines).encode()
+
+
+months = [f"{2023 - i // 12}{12 - i % 12:02}" for i in range(FILES)]
+files = {f"{month}c.txt": county_file(month) for month in months}
+listing = "".join(f'<tr><td><a href="{name}">{name}</a></td></tr>' for name in files)
+listing = f"<html><table>{listing}</table></html>".encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(args.latency)
+        name = self.path.split("?")[0].rsplit("/", 1)[1]
+        body = files[name] if name else listing
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# (record responses somewhere they won't mix with real ones)
+fetch.HTTP_CACHE_DIR = Path(tempfile.mkdtemp())
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+housing.county_files_url = f"http://127.0.0.1:{server.server_port}/econ/bps/County/"
+
+print(f"{FILES} files, {args.latency * 1000:.0f} ms latency")
+print(f"{'concurrency':>12}{'wall time (s)':>16}{'speedup':>10}")
+expected = None
+for concurrency in args.concurrency:
+    start = time.perf_counter()
+    data = housing.parse(housing.fetch(concurrency, manifest_path=None))
+    elapsed = time.perf_counter() - start
+    if expected is None:
+        expected, baseline = data, elapsed
+    assert data == expected, f"totals differ at concurrency {concurrency}"
+    print(f"{concurrency:>12}{elapsed:>16.3f}{baseline / elapsed:>9.1f}x")
+
+server.shutdown()
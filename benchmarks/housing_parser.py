@@ -0,0 +1,113 @@
+"""
+Compare the cost of parsing a Census county permit file in housing.py.
+
+  * csv: the original approach, where every line went through csv.reader and its FIPS code was
+    checked against a list of the DVRPC counties, so only their lines were summed.
+  * csv (all): csv.reader again, but keeping the totals of every county, as housing.py now must
+    (so other regions can be totaled).
+  * split: the current approach, housing.parse_file(), which keeps the totals of every county,
+    splitting lines on commas directly unless they're quoted.
+
+All are run on the same synthetic national file (a line for each of --counties counties, plus a
+few unreadable lines); the totals of the last two are checked to be identical, and the DVRPC
+Region's totals to be identical to the first's.
+
+No database or network is used (and so data/config.py isn't needed):
+
+    python benchmarks/housing_parser.py [--counties N] [--repeat N]
+"""
+
+import argparse
+import csv
+import logging
+from pathlib import Path
+import random
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+
+import housing
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--counties", type=int, default=3200)
+parser.add_argument("--repeat", type=int, default=20)
+args = parser.parse_args()
+
+# (the unreadable lines are logged by both; that's not what's being compared)
+logging.disable(logging.CRITICAL)
+
+old_dvrpc_counties = sorted(housing.dvrpc_counties)
+
+
+def national_file(month: str, num_counties: int) -> list:
+    """Create the lines of a county file for *month* (YYYYMM)."""
+    lines = ["Survey,FIPS,FIPS,Region,Division,County,,1-unit", "Date,State,County", ""]
+    counties = [(c[:2], c[2:]) for c in old_dvrpc_counties]
+    counties += [(f"{i // 100 + 1:02}", f"{i % 100 * 2 + 1:03}") for i in range(num_counties)]
+    random.shuffle(counties)
+    for state, county in counties:
+        units = ",".join(
+            f"{random.randint(1, 20)},{random.randint(0, 300)},{random.randint(0, 99999)}"
+            for _ in range(4)
+        )
+        lines.append(f"{month},{state},{county},1,2,Some County       ,{units}")
+    lines.insert(100, "")
+    lines.insert(200, f"{month},42,101,1,2,Philadelphia County,1,n/a,1")
+    return lines
+
+
+def csv_path(file: str, lines: list) -> dict:
+    data = {}
+    for row in csv.reader(lines[3:]):
+        try:
+            if row[1] + row[2] in old_dvrpc_counties:
+                try:
+                    data[row[0]] = (
+                        data[row[0]] + int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
+                    )
+                except KeyError:
+                    try:
+                        data[row[0]] = int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
+                    except Exception as e:
+                        logging.error(f"Error in {file} for {row[0]}, {row[1]}{row[2]}: {e}")
+                except Exception as e:
+                    logging.error(f"Error in {file} for {row[0]}, {row[1]}{row[2]}: {e}")
+        except IndexError:
+            logging.error("Cannot read columns 1 and/or 2 in row")
+    return data
+
+
+def csv_all_path(file: str, lines: list) -> dict:
+    data = {}
+    for row in csv.reader(lines[3:]):
+        try:
+            units = int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
+        except (IndexError, ValueError) as e:
+            logging.error(f"Error in {file}: {e}")
+            continue
+        counties = data.setdefault(row[0], {})
+        fips = row[1] + row[2]
+        counties[fips] = counties.get(fips, 0) + units
+    return data
+
+
+def region_totals(totals: dict) -> dict:
+    return {
+        month: sum(units for fips, units in counties.items() if fips in housing.dvrpc_counties)
+        for month, counties in totals.items()
+    }
+
+
+lines = national_file("202301", args.counties)
+totals = housing.parse_file("202301c.txt", lines)
+assert csv_path("202301c.txt", lines) == region_totals(totals), "totals differ"
+assert csv_all_path("202301c.txt", lines) == totals, "totals differ"
+
+results = []
+for path in [csv_path, csv_all_path, housing.parse_file]:
+    best = min(timeit.repeat(lambda: path("202301c.txt", lines), number=1, repeat=args.repeat))
+    results.append(best * 1000)
+print(f"{len(lines):,} lines")
+print(f"{'csv (ms/file)':>16}{'csv (all)':>12}{'split':>10}{'vs csv (all)':>15}")
+print(f"{results[0]:>16.2f}{results[1]:>12.2f}{results[2]:>10.2f}{results[1] / results[2]:>14.1f}x")
@@ -0,0 +1,103 @@
+"""
+Compare the cost of computing year-over-year changes in the data/ scripts.
+
+  * scan: the original approach, where each record's year-ago value was found by searching every
+    record (as cpi.py and industry_employment.py did), which is quadratic in the number of records.
+  * keyed: the current approach, transforms.lagged_values(), which looks them up by
+    (series, period).
+
+Both compute the one- and two-year changes and percentage changes that industry_employment.py
+stores, for synthetic monthly series, and their output is checked to be identical.
+
+No database or network is used:
+
+    python benchmarks/lagged_changes.py [--series N] [--years N] [--repeat N]
+"""
+
+import argparse
+from datetime import date
+from pathlib import Path
+import random
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+
+from transforms import change, lagged_values, percent_change
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--series", type=int, default=22)
+parser.add_argument("--years", type=int, nargs="+", default=[3, 10, 20])
+parser.add_argument("--repeat", type=int, default=3)
+args = parser.parse_args()
+
+
+def synthetic_records(num_series: int, years: int) -> list:
+    """Create monthly records for *num_series* area/industry series over *years* years."""
+    records = []
+    for i in range(num_series):
+        for year in range(2022, 2022 - years, -1):
+            for month in range(12, 0, -1):
+                records.append(
+                    {
+                        "period": date(year, month, 1),
+                        "area": "Philadelphia MSA" if i % 2 else "Trenton MSA",
+                        "industry": f"industry {i // 2}",
+                        "jobs": str(round(random.uniform(10, 900), 1)),
+                    }
+                )
+    return records
+
+
+def scan(records: list) -> list:
+    results = []
+    for record in records:
+        lagged = []
+        for years in [1, 2]:
+            period = date(record["period"].year - years, record["period"].month, 1)
+            lagged.append(
+                next(
+                    (
+                        item["jobs"]
+                        for item in records
+                        if item["period"] == period
+                        and item["area"] == record["area"]
+                        and item["industry"] == record["industry"]
+                    ),
+                    None,
+                )
+            )
+        results.append(
+            tuple(
+                f(record["jobs"], previous, digits)
+                for previous in lagged
+                for f, digits in [(change, 2), (percent_change, 1)]
+            )
+        )
+    return results
+
+
+def keyed(records: list) -> list:
+    one_year_ago = lagged_values(records, "jobs", ["area", "industry"], 1)
+    two_years_ago = lagged_values(records, "jobs", ["area", "industry"], 2)
+    return [
+        (
+            change(record["jobs"], one, 2),
+            percent_change(record["jobs"], one, 1),
+            change(record["jobs"], two, 2),
+            percent_change(record["jobs"], two, 1),
+        )
+        for record, one, two in zip(records, one_year_ago, two_years_ago)
+    ]
+
+
+print(f"{'records':>10}{'scan (s)':>12}{'keyed (s)':>12}{'speedup':>10}")
+for years in args.years:
+    records = synthetic_records(args.series, years)
+    assert scan(records) == keyed(records), "outputs differ"
+
+    results = []
+    for path in [scan, keyed]:
+        results.append(min(timeit.repeat(lambda: path(records), number=1, repeat=args.repeat)))
+    speedup = results[0] / results[1]
+    print(f"{len(records):>10,}{results[0]:>12.3f}{results[1]:>12.4f}{speedup:>9.0f}x")
@@ -0,0 +1,160 @@
+"""
+Measure the time and peak memory of each stage of each data/ script, loading into a local
+Postgres database.
+
+    python benchmarks/loaders.py DSN [--start-year YEAR] [--end-year YEAR] [--counties N]
+        [--files N] [--repeat N] [--save PATH] [--compare PATH]
+
+Synthetic responses (see synthetic.py) are recorded for every request the scripts make: BLS data
+from --start-year to --end-year, and --files (up to 36) Census county files of --counties
+counties. The scripts are then run in replay mode (see fetch.py), so no network is used, and
+"fetch" measures reading and decoding the recorded responses. Each stage's time is the best of
+--repeat runs; its peak memory is measured (with tracemalloc) in a separate run. "load" is into
+empty tables, and "reload" loads the same data again, when nothing has changed.
+
+DSN should be a database just for benchmarking: the scripts' tables are emptied before each run.
+(Run synthetic.py again afterwards to benchmark the API with it.) The data/ scripts are imported,
+so data/config.py needs to exist (for BLS_API_KEY), but its PG_CREDS isn't used. With --save,
+the results are saved as a baseline (see baseline.py); with --compare, they're compared with one
+saved earlier.
+"""
+
+import argparse
+from datetime import date
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+
+import psycopg
+
+import baseline
+import bls
+import fetch
+import run_all
+import synthetic
+
+parser = argparse.ArgumentParser()
+parser.add_argument("dsn", help="connection string of the database to load")
+parser.add_argument("--start-year", type=int, default=date.today().year - 20)
+parser.add_argument("--end-year", type=int, default=date.today().year - 1)
+parser.add_argument("--counties", type=int, default=3200)
+parser.add_argument("--files", type=int, default=36)
+parser.add_argument("--repeat", type=int, default=3)
+parser.add_argument("--save", help="save the results as a baseline to this file")
+parser.add_argument("--compare", help="compare the results with the baseline in this file")
+args = parser.parse_args()
+
+stages = ["fetch", "parse", "transform", "load", "reload"]
+
+
+def record_bls(module):
+    """Record a synthetic response for each request *module*.fetch() makes."""
+
+    def post_json(url, payload, is_valid=None):
+        response = synthetic.bls_response(
+            payload["seriesid"], int(payload["startyear"]), int(payload["endyear"])
+        )
+        key = fetch.cache_key("POST", url, payload)
+        body = json.dumps(response).encode()
+        fetch.write_cache(key, fetch.Response(200, {}, body), {"method": "POST", "url": url})
+        return response
+
+    bls.post_json = post_json
+    try:
+        module.fetch(args.start_year, args.end_year)
+    finally:
+        bls.post_json = fetch.post_json
+
+
+def record_housing():
+    """Record a synthetic directory listing and county files."""
+    months = synthetic.months(args.end_year - 2, args.end_year)[::-1][: args.files]
+    files = [f"{period:%Y%m}c.txt" for period in months]
+    counties = synthetic.county_codes(args.counties)
+    responses = {run_all.housing.county_files_url + "?C=N;O=D": synthetic.county_listing(files)}
+    for file in files:
+        url = run_all.housing.county_files_url + file
+        responses[url] = synthetic.county_file(file[:6], counties)
+    for url, text in responses.items():
+        response = fetch.Response(200, {}, text.encode())
+        fetch.write_cache(fetch.cache_key("GET", url), response, {"method": "GET", "url": url})
+
+
+def run(module, conn, trace: bool = False) -> dict:
+    """
+    Run each stage of *module*, and return how long each took in seconds or, with *trace*, the
+    peak memory (in bytes) allocated during each.
+    """
+    conn.execute(
+        "TRUNCATE cpi, unemployment_rate, employment_by_industry, employment_by_industry_summary, "
+        "housing, housing_county, complete_periods, data_version"
+    )
+    conn.commit()
+    results = {}
+    data = None
+    for stage in stages:
+        if stage == "fetch" and module in run_all.bls_sources:
+            f, stage_args = module.fetch, (args.start_year, args.end_year)
+        elif stage == "fetch":
+            # (with no manifest, housing.py downloads, or here reads, every file)
+            f, stage_args = module.fetch, (module.DOWNLOAD_CONCURRENCY, None)
+        elif stage == "parse":
+            f, stage_args = module.parse, (data,)
+        elif stage == "transform":
+            if not hasattr(module, "transform"):
+                continue
+            f, stage_args = module.transform, (data,)
+        else:
+            f, stage_args = module.load, (conn, data)
+
+        if trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = f(*stage_args)
+        if stage in ["load", "reload"]:
+            conn.commit()
+        else:
+            data = result
+        if trace:
+            results[stage] = tracemalloc.get_traced_memory()[1] - before
+        else:
+            results[stage] = time.perf_counter() - start
+    return results
+
+
+def main():
+    fetch.HTTP_CACHE_DIR = Path(tempfile.mkdtemp())
+    # (in replay mode, nothing counts against the BLS API's daily limit)
+    fetch.set_mode("replay")
+    for module in run_all.bls_sources:
+        record_bls(module)
+    record_housing()
+
+    results = {}
+    with psycopg.connect(args.dsn) as conn:
+        for name, module in run_all.sources.items():
+            best = {}
+            for _ in range(args.repeat):
+                for stage, seconds in run(module, conn).items():
+                    best[stage] = min(best.get(stage, seconds), seconds)
+            tracemalloc.start()
+            peaks = run(module, conn, trace=True)
+            tracemalloc.stop()
+
+            results[name] = {f"{stage} (s)": best.get(stage) for stage in stages}
+            for stage in stages:
+                peak = peaks.get(stage)
+                results[name][f"{stage} (MB)"] = peak and peak / 2**20
+
+    baseline.report(results, baseline.load(args.compare) if args.compare else None)
+    if args.save:
+        baseline.save(args.save, results)
+
+
+main()
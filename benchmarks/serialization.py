@@ -0,0 +1,91 @@
+"""
+Compare the per-row cost of encoding API responses.
+
+  * models: the original path, where get_data() built a response model for each row and FastAPI
+    then validated and encoded them again through the route's response_model.
+  * fast: the current path, where get_data() zips each row into a dict and encodes the list with
+    orjson.
+
+Both are run on the same synthetic rows, and their output is checked to be identical.
+
+It imports app.py, so api/config.py needs to exist, but no database is used:
+
+    python benchmarks/serialization.py [--rows N] [--repeat N]
+"""
+
+import argparse
+import asyncio
+from datetime import date
+import json
+from pathlib import Path
+import random
+import sys
+import timeit
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from app import IndexRateResponse, RateResponse, UnitsResponse, encode, to_dicts
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=10000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+
+def synthetic_rows(table: str, n: int) -> list:
+    """Create *n* rows shaped like those of *table* (including its preliminary column)."""
+    rows = []
+    for i in range(n):
+        period = date(1950 + i // 12 % 8000, i % 12 + 1, 1)
+        if table == "cpi":
+            rows.append((period, "United States", round(random.uniform(20, 320), 3), None, False))
+        elif table == "unemployment_rate":
+            rows.append((period, "Philadelphia MSA", round(random.uniform(2, 12), 1), False))
+        else:
+            rows.append((period, random.randint(0, 5000)))
+    return rows
+
+
+def models_path(table: str, rows: list) -> bytes:
+    """Encode *rows* the way the API originally did."""
+    data = []
+    for row in rows:
+        if table == "cpi":
+            item = {"period": row[0], "area": row[1], "index": row[2], "rate": row[3]}
+            data.append(IndexRateResponse(**item))
+        elif table == "unemployment_rate":
+            item = {"period": row[0], "area": row[1], "rate": row[2]}
+            data.append(RateResponse(**item))
+        elif table == "housing":
+            item = {"period": row[0], "units": row[1]}
+            data.append(UnitsResponse(**item))
+    content = asyncio.run(serialize_response(field=response_fields[table], response_content=data))
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_path(table: str, rows: list) -> bytes:
+    return encode(to_dicts(table, rows))
+
+
+response_fields = {
+    "cpi": create_response_field(name="cpi", type_=List[IndexRateResponse]),
+    "unemployment_rate": create_response_field(name="unemployment", type_=List[RateResponse]),
+    "housing": create_response_field(name="housing", type_=List[UnitsResponse]),
+}
+
+print(f"{'table':<20}{'models (µs/row)':>18}{'fast (µs/row)':>16}{'speedup':>10}")
+for table in response_fields:
+    rows = synthetic_rows(table, args.rows)
+    assert models_path(table, rows) == fast_path(table, rows), "outputs differ for " + table
+
+    results = []
+    for path in [models_path, fast_path]:
+        best = min(timeit.repeat(lambda: path(table, rows), number=1, repeat=args.repeat))
+        results.append(best / args.rows * 1_000_000)
+    print(f"{table:<20}{results[0]:>18.2f}{results[1]:>16.3f}{results[0] / results[1]:>9.0f}x")
@@ -0,0 +1,253 @@
+"""
+Generate synthetic data for the benchmarks: a database of any size, and the BLS API responses and
+Census county files that the data/ scripts fetch.
+
+    python benchmarks/synthetic.py DSN [--areas N] [--start-year YEAR] [--end-year YEAR]
+        [--counties N] [--seed N]
+
+fills the database at DSN with --areas areas (the four real ones, plus synthetic ones beyond
+those) of monthly data from --start-year to --end-year, and --counties counties of housing data.
+DSN should be a database just for benchmarking: the tables in data/create_tables.sql are created
+in it if need be, and emptied first. (The synthetic areas are added to its geographic_area type.)
+
+The data/ scripts are imported (for the database helpers they share), so data/config.py needs to
+exist, but its PG_CREDS isn't used.
+"""
+
+import argparse
+from datetime import date
+from pathlib import Path
+import random
+import sys
+import time
+
+data_dir = Path(__file__).resolve().parent.parent / "data"
+sys.path.insert(0, str(data_dir))
+
+import psycopg
+from psycopg import sql
+
+from db import bump_data_version, update_complete_periods
+import housing
+import industry_employment
+
+real_areas = ["United States", "DVRPC Region", "Philadelphia MSA", "Trenton MSA"]
+
+tables = [
+    "cpi",
+    "unemployment_rate",
+    "housing",
+    "housing_county",
+    "employment_by_industry",
+    "employment_by_industry_summary",
+    "complete_periods",
+    "data_version",
+]
+
+
+def months(start_year: int, end_year: int) -> list:
+    """Get the first day of each month from *start_year* to *end_year*."""
+    return [
+        date(year, month, 1) for year in range(start_year, end_year + 1) for month in range(1, 13)
+    ]
+
+
+def area_names(n: int) -> list:
+    """Get *n* area names: the real ones first, and then synthetic ones."""
+    return real_areas[:n] + [f"Synthetic Area {i}" for i in range(1, n - len(real_areas) + 1)]
+
+
+def county_codes(n: int) -> list:
+    """Get *n* 5-digit county FIPS codes: the DVRPC counties first, and then synthetic ones."""
+    # (the synthetic ones are in states numbered from 01, well away from NJ's 34 and PA's 42 for
+    # any reasonable n)
+    codes = sorted(housing.dvrpc_counties)
+    codes += [f"{i // 300 + 1:02}{i % 300 * 2 + 1:03}" for i in range(max(n - len(codes), 0))]
+    return codes[:n]
+
+
+def copy(conn, table: str, columns: list, rows):
+    with conn.cursor().copy(
+        sql.SQL("COPY {table} ({columns}) FROM STDIN").format(
+            table=sql.Identifier(table), columns=sql.SQL(", ").join(map(sql.Identifier, columns))
+        )
+    ) as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def populate(
+    conn, num_areas: int, start_year: int, end_year: int, num_counties: int, seed: int = 0
+):
+    """
+    Empty the tables of the database at *conn*, and fill them with synthetic data of the given
+    size (see the module's docstring). *conn* must be in autocommit mode, so that the synthetic
+    areas can be added to geographic_area before they're used.
+    """
+    rng = random.Random(seed)
+    periods = months(start_year, end_year)
+    areas = area_names(num_areas)
+
+    conn.execute((data_dir / "create_tables.sql").read_text())
+    for area in areas[len(real_areas) :]:
+        conn.execute(
+            sql.SQL("ALTER TYPE geographic_area ADD VALUE IF NOT EXISTS {area}").format(
+                area=sql.Literal(area)
+            )
+        )
+
+    with conn.transaction():
+        conn.execute(
+            sql.SQL("TRUNCATE {tables}").format(
+                tables=sql.SQL(", ").join(map(sql.Identifier, tables))
+            )
+        )
+
+        # (as in the real data, CPI has no Trenton MSA, and is only every other month for the
+        # Philadelphia MSA; unemployment and employment have no DVRPC Region or United States)
+        cpi_areas = [area for area in areas if area not in ["DVRPC Region", "Trenton MSA"]]
+        rows = []
+        for area in cpi_areas:
+            index = rng.uniform(20, 40)
+            for i, period in enumerate(periods):
+                index *= rng.uniform(0.995, 1.01)
+                if area == "Philadelphia MSA" and period.month % 2:
+                    continue
+                rate = rng.uniform(-2, 10) if i >= 12 else None
+                rows.append((period, area, round(index, 3), rate, i >= len(periods) - 2))
+        copy(conn, "cpi", ["period", "area", "idx", "rate", "preliminary"], rows)
+        update_complete_periods(conn, "cpi", periods, len(cpi_areas))
+
+        rate_areas = [area for area in areas if area not in ["DVRPC Region", "United States"]]
+        rate_areas.insert(0, "United States")
+        rows = [
+            (period, area, round(rng.uniform(2, 12), 1), i >= len(periods) - 2)
+            for area in rate_areas
+            for i, period in enumerate(periods)
+        ]
+        copy(conn, "unemployment_rate", ["period", "area", "rate", "preliminary"], rows)
+        update_complete_periods(conn, "unemployment_rate", periods, len(rate_areas))
+
+        employment_areas = rate_areas[1:]
+        columns = [
+            "period",
+            "area",
+            "industry",
+            "number",
+            "change1year",
+            "percentchange1year",
+            "change2year",
+            "percentchange2year",
+            "preliminary",
+        ]
+        rows = []
+        for area in employment_areas:
+            for industry in industry_employment.industries.values():
+                for i, period in enumerate(periods):
+                    change1 = rng.uniform(-20, 20) if i >= 12 else None
+                    change2 = rng.uniform(-30, 30) if i >= 24 else None
+                    rows.append(
+                        (
+                            period,
+                            area,
+                            industry,
+                            round(rng.uniform(10, 900), 1),
+                            change1,
+                            change1 and change1 / 5,
+                            change2,
+                            change2 and change2 / 5,
+                            i >= len(periods) - 2,
+                        )
+                    )
+        copy(conn, "employment_by_industry", columns, rows)
+        industry_employment.rebuild_summary(conn)
+
+        counties = county_codes(num_counties)
+        rows = ((period, fips, rng.randint(0, 400)) for period in periods for fips in counties)
+        copy(conn, "housing_county", ["period", "fips", "units"], rows)
+        conn.execute("""
+            INSERT INTO housing (period, units)
+            SELECT period, sum(units)
+            FROM housing_county
+            JOIN region_county USING (fips)
+            WHERE region = 'DVRPC Region'
+            GROUP BY period
+            """)
+
+        for table in ["cpi", "unemployment_rate", "employment_by_industry", "housing"]:
+            bump_data_version(conn, table)
+    conn.execute("ANALYZE")
+
+
+def bls_response(series: list, start_year: int, end_year: int, seed: int = 0) -> dict:
+    """Create a response from BLS's API for *series* from *start_year* to *end_year*."""
+    rng = random.Random(f"{seed} {series} {start_year}")
+    results = []
+    for series_id in series:
+        data = []
+        for year in range(end_year, start_year - 1, -1):
+            for month in range(12, 0, -1):
+                latest = year == end_year and month >= 11
+                data.append(
+                    {
+                        "year": str(year),
+                        "period": f"M{month:02}",
+                        "periodName": "",
+                        "value": str(round(rng.uniform(2, 300), 1)),
+                        "footnotes": [{"code": "P", "text": "preliminary"} if latest else {}],
+                    }
+                )
+        results.append({"seriesID": series_id, "data": data})
+    return {"status": "REQUEST_SUCCEEDED", "Results": {"series": results}}
+
+
+def county_listing(files: list) -> str:
+    """Create the Census's directory listing of county *files* (most recent first)."""
+    rows = "".join(
+        f'<tr><td><img></td><td><a href="{file}">{file}</a></td>'
+        f'<td align="right">2024-01-17 08:00  </td><td align="right">250K</td></tr>'
+        for file in files
+    )
+    return f"<html><body><table>{rows}</table></body></html>"
+
+
+def county_file(month: str, counties: list, seed: int = 0) -> str:
+    """Create the Census's county file for *month* (YYYYMM) with a line for each of *counties*."""
+    rng = random.Random(f"{seed} {month}")
+    lines = [
+        "Survey,FIPS,FIPS,Region,Division,County,,1-unit,,,2-units,,,3-4 units,,,5+ units",
+        "Date,State,County,Code,Code,Name,Bldgs,Units,Value,Bldgs,Units,Value,Bldgs,Units,Value,"
+        "Bldgs,Units,Value",
+        "",
+    ]
+    for fips in counties:
+        units = ",".join(
+            f"{rng.randint(0, 50)},{rng.randint(0, 100)},{rng.randint(0, 99999)}" for _ in range(4)
+        )
+        lines.append(f"{month},{fips[:2]},{fips[2:]},1,2,County {fips}       ,{units}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dsn", help="connection string of the database to fill")
+    parser.add_argument("--areas", type=int, default=len(real_areas))
+    parser.add_argument("--start-year", type=int, default=1950)
+    parser.add_argument("--end-year", type=int, default=date.today().year - 1)
+    parser.add_argument("--counties", type=int, default=3200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        populate(conn, args.areas, args.start_year, args.end_year, args.counties, args.seed)
+        for table in tables:
+            count = conn.execute(
+                sql.SQL("SELECT count(*) FROM {table}").format(table=sql.Identifier(table))
+            ).fetchone()[0]
+            print(f"{table:<32}{count:>12,} rows")
+    print(f"done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
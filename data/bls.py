@@ -0,0 +1,182 @@
+"""
+Fetch and parse data from BLS's API.
+
+The API limits the number of series and the span of years in each request, as well as the number
+of requests per day (see <https://www.bls.gov/developers/api_faqs.htm>). fetch() plans the
+requests needed for any number of series and years within those limits, sends them
+concurrently, and merges the results. Requests are counted against the daily limit with a token
+bucket that's saved between runs (in bls_quota.json), and a plan that would exceed it fails before
+anything is sent. (Requests answered from recorded responses, without being sent, don't count; see
+fetch.py.)
+
+For a quick reference to the data returned by the API, add the series at the end of this URL:
+<https://api.bls.gov/publicAPI/v2/timeseries/data/SERIES_GOES_HERE>.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+import json
+from pathlib import Path
+import threading
+
+from config import BLS_API_KEY
+import fetch as http
+from fetch import FetchError, post_json
+
+API_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
+
+# limits per request and per day, with and without a registration key
+if BLS_API_KEY:
+    MAX_SERIES = 50
+    MAX_YEARS = 20
+    DAILY_QUERIES = 500
+else:
+    MAX_SERIES = 25
+    MAX_YEARS = 10
+    DAILY_QUERIES = 25
+
+# number of requests sent at once
+CONCURRENCY = 4
+
+# years of data to get when not given any, ending with the current year (as the API does)
+DEFAULT_YEARS = 3
+
+QUOTA_FILE = Path(__file__).resolve().parent / "bls_quota.json"
+
+
+class TokenBucket:
+    """
+    Allow up to *capacity* requests, with tokens refilled continuously at *capacity* per *period*
+    seconds. The state is saved in *path* (if given), so the limit holds across runs.
+    """
+
+    def __init__(self, capacity: int, period: float, path: Path = None):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.path = path
+        self.lock = threading.Lock()
+        self.tokens = capacity
+        self.updated = datetime.now(timezone.utc).timestamp()
+        if path and path.exists():
+            with open(path) as f:
+                state = json.load(f)
+            self.tokens = min(state["tokens"], capacity)
+            self.updated = state["updated"]
+
+    def take(self, n: int = 1):
+        """Take *n* tokens, or raise a FetchError (and take none) if there aren't enough."""
+        with self.lock:
+            now = datetime.now(timezone.utc).timestamp()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < n:
+                raise FetchError(
+                    f"BLS API: {n} requests needed, but only {int(self.tokens)} of the daily "
+                    f"limit of {self.capacity} are left."
+                )
+            self.tokens -= n
+            if self.path:
+                with open(self.path, "w") as f:
+                    json.dump({"tokens": self.tokens, "updated": self.updated}, f)
+
+
+quota = TokenBucket(DAILY_QUERIES, 24 * 60 * 60, QUOTA_FILE)
+
+
+def years(start_year: int = None, end_year: int = None) -> tuple:
+    """
+    Get the (start year, end year) to fetch, given either, both or neither: the end year defaults
+    to the current year, and the start year to DEFAULT_YEARS before the end year.
+    """
+    end_year = end_year or date.today().year
+    start_year = start_year or end_year - DEFAULT_YEARS + 1
+    if start_year > end_year:
+        raise ValueError(f"start year {start_year} is after end year {end_year}")
+    return start_year, end_year
+
+
+def plan(series: list, start_year: int = None, end_year: int = None, lag_years: int = 0) -> list:
+    """
+    Split *series* (a list of series IDs) from *start_year* to *end_year* (see years()), and the
+    *lag_years* before them, into requests within the API's limits, as (series, start year, end
+    year) tuples.
+    """
+    start_year, end_year = years(start_year, end_year)
+    windows = [
+        (start, min(start + MAX_YEARS - 1, end_year))
+        for start in range(start_year - lag_years, end_year + 1, MAX_YEARS)
+    ]
+
+    return [
+        (series[i : i + MAX_SERIES], start, end)
+        for i in range(0, len(series), MAX_SERIES)
+        for start, end in windows
+    ]
+
+
+def succeeded(response: dict) -> bool:
+    return response.get("status") == "REQUEST_SUCCEEDED"
+
+
+def batch_payload(batch: tuple) -> dict:
+    """Create the payload of the request for *batch* (as planned by plan())."""
+    series, start_year, end_year = batch
+    return {
+        "seriesid": series,
+        "startyear": str(start_year),
+        "endyear": str(end_year),
+        "registrationkey": BLS_API_KEY,
+    }
+
+
+def fetch_batch(batch: tuple) -> list:
+    response = post_json(API_URL, batch_payload(batch), is_valid=succeeded)
+    # (the API responds with a 200 even when it doesn't process the request, e.g. when the daily
+    # limit has been reached)
+    if not succeeded(response):
+        raise FetchError("BLS API: " + " ".join(response.get("message", ["request failed"])))
+    return response["Results"]["series"]
+
+
+def fetch(series: list, start_year: int = None, end_year: int = None, lag_years: int = 0) -> list:
+    """
+    Get *series* (a list of series IDs) from the API, from *start_year* to *end_year* (see
+    years()) and the *lag_years* before them, as the list of series in its Results.
+
+    However many requests that takes, each series appears once, with all of its data, most
+    recent first.
+    """
+    batches = plan(series, start_year, end_year, lag_years)
+    # (only requests that will be sent count against the limit, not those answered from recorded
+    # responses)
+    to_send = sum(http.will_post(API_URL, batch_payload(batch)) for batch in batches)
+    if to_send:
+        quota.take(to_send)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(fetch_batch, batches))
+
+    merged = {series_id: [] for series_id in series}
+    for result in results:
+        for each in result:
+            merged[each["seriesID"]].extend(each["data"])
+    return [
+        {
+            "seriesID": series_id,
+            "data": sorted(data, key=lambda r: (r["year"], r["period"]), reverse=True),
+        }
+        for series_id, data in merged.items()
+    ]
+
+
+def period(record: dict) -> date:
+    """Get the period (as the first day of the month) of a *record* in a series' data."""
+    return date.fromisoformat(record["year"] + "-" + (str(record["period"][1:]) + "-01"))
+
+
+def preliminary(record: dict) -> bool:
+    """Determine if a *record* in a series' data is preliminary."""
+    preliminary = False
+    for each in record["footnotes"]:
+        preliminary = True if each.get("code") == "P" else False
+    return preliminary
@@ -0,0 +1,2 @@
+PG_CREDS = "postgresql://postgres:@/econ_data?host=/tmp/pgdata"
+BLS_API_KEY = ""
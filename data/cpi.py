@@ -3,133 +3,101 @@ Fetch CPI (all urban consumers) data from BLS's API.
 
 The base period for the index is 1982-84 (= 100).
 
-If --csv is passed to the program (python3 cpi_all_urban_consumers.py --csv), it will create a
-CSV of the fetched data. Otherwise, it will insert it into the database specified in the PG_CREDS
-variable in config.py.
+If --csv is passed to the program (python3 cpi.py --csv), it will create a CSV of the fetched
+data. Otherwise, it will insert it into the database specified in the PG_CREDS variable in
+config.py. With --snapshot PATH, it will load it into the snapshot at PATH (see snapshot.py)
+instead.
+
+The fetch, parse, transform and load steps can also be imported and run by run_all.py.
 """
 
 import argparse
 import csv
-from datetime import date
-import json
 from pathlib import Path
+import sqlite3
 import sys
 
 import psycopg
-import requests
-
-from config import BLS_API_KEY
-
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--csv", action="store_true")
-args = parser.parse_args()
+import bls
+from db import bump_data_version, update_complete_periods, upsert
+from fetch import FetchError, set_mode
+import snapshot
+from transforms import drop_lag_years, lagged_values, percent_change
 
-# we don't need a database connection if just trying to create a CSV
-if args.csv:
-    PG_CREDS = ""
-else:
-    from config import PG_CREDS
+table = "cpi"
 
 us = "CUUR0000SA0"
 philadelphia = "CUURS12BSA0"
 
-# Get data from API
-headers = {"Content-type": "application/json"}
-data = json.dumps(
-    {
-        "seriesid": [us, philadelphia],
-        "registrationkey": BLS_API_KEY,
-    }
-)
-p = requests.post("https://api.bls.gov/publicAPI/v2/timeseries/data/", data=data, headers=headers)
-if p.status_code != 200:
-    sys.exit(f"Unable to fetch data from BLS API.")
-
-json_data = json.loads(p.text)
-
-data = []
-
-# create list of dictionaries from data
-# do this an intermediary step so we can then calculate year-over-year rates
-for series in json_data["Results"]["series"]:
-    if series["seriesID"] == us:
-        area = "United States"
-    if series["seriesID"] == philadelphia:
-        area = "Philadelphia MSA"
-
-    for record in series["data"]:
-        period = date.fromisoformat(record["year"] + "-" + (str(record["period"][1:]) + "-01"))
-
-        # determine if preliminary data
-        for each in record["footnotes"]:
-            preliminary = True if each.get("code") == "P" else False
-
-        data.append(
-            {"period": period, "area": area, "index": record["value"], "preliminary": preliminary}
-        )
-
-# calculate and add the year-over-year percentage change
-for record in data:
-    previous_year_period = date(
-        record["period"].year - 1, record["period"].month, record["period"].day
-    )
-    # get previous year's index, or None if not available (before start of data)
-    year_ago_index = next(
-        (
-            item["index"]
-            for item in data
-            if item["period"] == previous_year_period and item["area"] == record["area"]
-        ),
-        None,
+# years before the first one loaded that are needed to calculate the changes (see transform())
+LAG_YEARS = 1
+
+
+def fetch(start_year: int = None, end_year: int = None) -> list:
+    """Get the series from BLS's API, for bls.DEFAULT_YEARS unless given, and the LAG_YEARS before."""
+    return bls.fetch([us, philadelphia], start_year, end_year, LAG_YEARS)
+
+
+def parse(series_list: list) -> list:
+    """Create list of dictionaries from data."""
+    data = []
+    for series in series_list:
+        if series["seriesID"] == us:
+            area = "United States"
+        if series["seriesID"] == philadelphia:
+            area = "Philadelphia MSA"
+
+        for record in series["data"]:
+            data.append(
+                {
+                    "period": bls.period(record),
+                    "area": area,
+                    "index": record["value"],
+                    "preliminary": bls.preliminary(record),
+                }
+            )
+    return data
+
+
+def transform(data: list) -> list:
+    """
+    Calculate and add the year-over-year percentage change, and then drop the LAG_YEARS fetched
+    only to calculate it.
+    """
+    # (the previous year's index is None if not available (before start of data))
+    year_ago_indexes = lagged_values(data, "index", ["area"], 1)
+    for record, year_ago_index in zip(data, year_ago_indexes):
+        record["rate_yoy"] = percent_change(record["index"], year_ago_index, 2)
+    return drop_lag_years(data, LAG_YEARS)
+
+
+def load(conn, data: list):
+    """Add *data* to the database, and return the LoadResult."""
+    # Insert new records, or update idx/rate/prelim if data is no longer preliminary.
+    result = upsert(
+        conn,
+        table,
+        ["period", "area", "idx", "rate", "preliminary"],
+        ["period", "area"],
+        [
+            (
+                record["period"],
+                record["area"],
+                record["index"],
+                record["rate_yoy"],
+                record["preliminary"],
+            )
+            for record in data
+        ],
     )
-    try:
-        rate = ((float(record["index"]) - float(year_ago_index)) / float(year_ago_index)) * 100
-        record["rate_yoy"] = round(rate, 2)
-    except TypeError:
-        record["rate_yoy"] = None
+    if result.changed:
+        update_complete_periods(conn, table, result.periods, 2)
+        bump_data_version(conn, table)
+    return result
 
 
-# go through results and either add to db or (for --csv), put into list for later
-if not args.csv:
-    try:
-        with psycopg.connect(PG_CREDS) as conn:
-            for record in data:
-                # Insert new record or update idx/prelim if data is no longer preliminary.
-                # Further explanation:
-                # If a conflict on PERIOD and AREA (i.e. already a record for that
-                # period/area), then update the values for IDX and PRELIMINARY
-                # **if and only if**
-                # the previous value for PRELIMINARY (cpi.preliminary) was true
-                # and current value for PRELIMINARY (excluded.preliminary) is false
-                conn.execute(
-                    """
-                            INSERT INTO cpi
-                            (period, area, idx, rate, preliminary)
-                            VALUES (%s, %s, %s, %s, %s)
-                            ON CONFLICT (period, area)
-                            DO UPDATE
-                            SET
-                                idx = %s,
-                                rate = %s,
-                                preliminary = 'f'
-                            WHERE
-                                cpi.preliminary = 't' AND
-                                excluded.preliminary = 'f'
-                        """,
-                    (
-                        record["period"],
-                        record["area"],
-                        record["index"],
-                        record["rate_yoy"],
-                        record["preliminary"],
-                        record["index"],
-                        record["rate_yoy"],
-                    ),
-                )
-    except psycopg.OperationalError:
-        sys.exit("Database error.")
-else:
+def write_csv(data: list):
     results_dir = "results"
     try:
         Path(results_dir).mkdir()
@@ -150,4 +118,50 @@ else:
         writer.writerow(dict(zip(fieldnames, header)))
         writer.writerows(data)
 
-    print("CSV created in results/ directory.")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--snapshot", help="load into the snapshot at this path")
+    parser.add_argument("--replay", action="store_true", help="only use recorded responses")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    args = parser.parse_args()
+    try:
+        bls.years(args.start_year, args.end_year)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.replay:
+        set_mode("replay")
+
+    try:
+        data = transform(parse(fetch(args.start_year, args.end_year)))
+    except FetchError as e:
+        sys.exit(str(e))
+
+    # either add to db or (for --csv) create CSV
+    if args.csv:
+        write_csv(data)
+        print("CSV created in results/ directory.")
+        return
+
+    if args.snapshot:
+        try:
+            with snapshot.connect(args.snapshot) as conn:
+                print(load(conn, data))
+        except sqlite3.OperationalError as e:
+            sys.exit(f"Snapshot error: {e}")
+        return
+
+    # (we don't need a database connection if just trying to create a CSV)
+    from config import PG_CREDS
+
+    try:
+        with psycopg.connect(PG_CREDS) as conn:
+            print(load(conn, data))
+    except psycopg.OperationalError:
+        sys.exit("Database error.")
+
+
+if __name__ == "__main__":
+    main()
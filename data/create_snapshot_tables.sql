@@ -0,0 +1,122 @@
+/* The tables of a snapshot: a SQLite file with the same tables (and columns, in the same order) as
+the Postgres database in create_tables.sql, which the API can serve from instead. snapshot.py
+creates them when it opens a snapshot, so this doesn't need to be run by hand.
+
+Columns of Postgres's enum types are plain TEXT here, so that any SQLite client can read the file.
+The enums' values are recorded in enum_value, in order, and the API sorts them in that order
+where Postgres would sort by the enum (see api/snapshot.py).
+*/
+
+CREATE TABLE IF NOT EXISTS enum_value (
+    type_name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    sort_order INTEGER NOT NULL,
+    PRIMARY KEY (type_name, value)
+);
+
+CREATE TABLE IF NOT EXISTS cpi (
+    period DATE NOT NULL,
+    area TEXT NOT NULL,
+    idx REAL NOT NULL,
+    rate REAL,
+    preliminary BOOLEAN NOT NULL,
+    PRIMARY KEY (period, area)
+);
+
+CREATE TABLE IF NOT EXISTS unemployment_rate (
+    period DATE NOT NULL,
+    area TEXT NOT NULL,
+    rate REAL NOT NULL,
+    preliminary BOOLEAN NOT NULL,
+    PRIMARY KEY (period, area)
+);
+
+CREATE TABLE IF NOT EXISTS housing (
+    period DATE PRIMARY KEY,
+    units INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS employment_by_industry (
+    period DATE NOT NULL,
+    area TEXT NOT NULL,
+    industry TEXT NOT NULL,
+    number REAL NOT NULL,
+    change1year REAL,
+    percentchange1year REAL,
+    change2year REAL,
+    percentchange2year REAL,
+    preliminary BOOLEAN NOT NULL,
+    PRIMARY KEY (period, industry, area)
+);
+
+CREATE TABLE IF NOT EXISTS housing_county (
+    period DATE NOT NULL,
+    fips TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    PRIMARY KEY (fips, period)
+);
+
+CREATE TABLE IF NOT EXISTS region_county (
+    region TEXT NOT NULL,
+    fips TEXT NOT NULL,
+    PRIMARY KEY (region, fips)
+);
+
+INSERT INTO region_county (region, fips) VALUES
+    ('DVRPC Region', '34005'),
+    ('DVRPC Region', '34007'),
+    ('DVRPC Region', '34015'),
+    ('DVRPC Region', '34021'),
+    ('DVRPC Region', '42017'),
+    ('DVRPC Region', '42029'),
+    ('DVRPC Region', '42045'),
+    ('DVRPC Region', '42091'),
+    ('DVRPC Region', '42101'),
+    ('DVRPC Region (NJ)', '34005'),
+    ('DVRPC Region (NJ)', '34007'),
+    ('DVRPC Region (NJ)', '34015'),
+    ('DVRPC Region (NJ)', '34021'),
+    ('DVRPC Region (PA)', '42017'),
+    ('DVRPC Region (PA)', '42029'),
+    ('DVRPC Region (PA)', '42045'),
+    ('DVRPC Region (PA)', '42091'),
+    ('DVRPC Region (PA)', '42101'),
+    ('Burlington County, NJ', '34005'),
+    ('Camden County, NJ', '34007'),
+    ('Gloucester County, NJ', '34015'),
+    ('Mercer County, NJ', '34021'),
+    ('Bucks County, PA', '42017'),
+    ('Chester County, PA', '42029'),
+    ('Delaware County, PA', '42045'),
+    ('Montgomery County, PA', '42091'),
+    ('Philadelphia County, PA', '42101')
+ON CONFLICT DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS cpi_area_period ON cpi (area, period);
+CREATE INDEX IF NOT EXISTS unemployment_rate_area_period ON unemployment_rate (area, period);
+
+CREATE TABLE IF NOT EXISTS employment_by_industry_summary (
+    period DATE NOT NULL,
+    area TEXT NOT NULL,
+    industry TEXT NOT NULL,
+    number REAL NOT NULL,
+    share_of_total REAL NOT NULL,
+    change1year REAL,
+    percentchange1year REAL,
+    change2year REAL,
+    percentchange2year REAL,
+    PRIMARY KEY (period, industry, area)
+);
+
+CREATE TABLE IF NOT EXISTS complete_periods (
+    table_name TEXT NOT NULL,
+    period DATE NOT NULL,
+    PRIMARY KEY (table_name, period)
+);
+
+CREATE TABLE IF NOT EXISTS data_version (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL,
+    max_period DATE
+);
@@ -71,4 +71,105 @@ CREATE TABLE IF NOT EXISTS employment_by_industry (
     constraint industry_unique unique(period, industry, area)
 );
 
+/* Authorized housing units by county (every county in the country, by 5-digit state + county FIPS
+code) and month, as loaded by housing.py. The housing table above holds the DVRPC region's totals,
+maintained from this one; other regions' totals are summed from it as needed.
+*/
+CREATE TABLE IF NOT EXISTS housing_county (
+    period DATE NOT NULL,
+    fips CHAR(5) NOT NULL,
+    units INTEGER NOT NULL,
+    PRIMARY KEY (fips, period)
+);
+
+/* The counties in each region that housing can be summed for. After changing these, bump the
+housing table's version (see data/db.py) so the API stops serving responses cached for the old
+definitions.
+*/
+CREATE TABLE IF NOT EXISTS region_county (
+    region TEXT NOT NULL,
+    fips CHAR(5) NOT NULL,
+    PRIMARY KEY (region, fips)
+);
+
+INSERT INTO region_county (region, fips) VALUES
+    ('DVRPC Region', '34005'),
+    ('DVRPC Region', '34007'),
+    ('DVRPC Region', '34015'),
+    ('DVRPC Region', '34021'),
+    ('DVRPC Region', '42017'),
+    ('DVRPC Region', '42029'),
+    ('DVRPC Region', '42045'),
+    ('DVRPC Region', '42091'),
+    ('DVRPC Region', '42101'),
+    ('DVRPC Region (NJ)', '34005'),
+    ('DVRPC Region (NJ)', '34007'),
+    ('DVRPC Region (NJ)', '34015'),
+    ('DVRPC Region (NJ)', '34021'),
+    ('DVRPC Region (PA)', '42017'),
+    ('DVRPC Region (PA)', '42029'),
+    ('DVRPC Region (PA)', '42045'),
+    ('DVRPC Region (PA)', '42091'),
+    ('DVRPC Region (PA)', '42101'),
+    ('Burlington County, NJ', '34005'),
+    ('Camden County, NJ', '34007'),
+    ('Gloucester County, NJ', '34015'),
+    ('Mercer County, NJ', '34021'),
+    ('Bucks County, PA', '42017'),
+    ('Chester County, PA', '42029'),
+    ('Delaware County, PA', '42045'),
+    ('Montgomery County, PA', '42091'),
+    ('Philadelphia County, PA', '42101')
+ON CONFLICT DO NOTHING;
+
+/* Indexes for the API's queries by area and year range. (Queries by year range alone use the
+indexes behind the unique constraints, which all lead with period.)
+*/
+CREATE INDEX IF NOT EXISTS cpi_area_period ON cpi (area, period);
+CREATE INDEX IF NOT EXISTS unemployment_rate_area_period ON unemployment_rate (area, period);
+
+/* The summary served by the API's employment-by-industry endpoint: the most recent period and the
+period a year before it, with each industry's share of its area's total nonfarm employment.
+Rebuilt by industry_employment.py whenever it loads new data, or finds this empty.
+*/
+CREATE TABLE IF NOT EXISTS employment_by_industry_summary (
+    period DATE NOT NULL,
+    area geographic_area NOT NULL,
+    industry industry_group NOT NULL,
+    number REAL NOT NULL,
+    share_of_total REAL NOT NULL,
+    change1year REAL,
+    percentchange1year REAL,
+    change2year REAL,
+    percentchange2year REAL,
+    constraint industry_summary_unique unique(period, industry, area)
+);
+
+/* The periods for which a table has data for all of its areas, served by the API's *-recent
+endpoints. Kept up to date by cpi.py and unemployment.py as they load new data; the INSERTs below
+fill it from any data already loaded.
+*/
+CREATE TABLE IF NOT EXISTS complete_periods (
+    table_name TEXT NOT NULL,
+    period DATE NOT NULL,
+    PRIMARY KEY (table_name, period)
+);
+
+INSERT INTO complete_periods (table_name, period)
+    SELECT 'cpi', period FROM cpi GROUP BY period HAVING COUNT(area) = 2
+    ON CONFLICT DO NOTHING;
+INSERT INTO complete_periods (table_name, period)
+    SELECT 'unemployment_rate', period FROM unemployment_rate GROUP BY period HAVING COUNT(area) = 3
+    ON CONFLICT DO NOTHING;
+
+/* Bumped by the data/ scripts whenever they change a table, so the API knows when to drop its
+cached responses for that table and can tell clients when the data was last modified.
+*/
+CREATE TABLE IF NOT EXISTS data_version (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL,
+    max_period DATE
+);
+
 COMMIT;
@@ -0,0 +1,280 @@
+"""
+Database helpers shared by the scripts in this directory.
+
+Each takes either a psycopg connection or a snapshot.Connection (see snapshot.py).
+"""
+
+from collections import namedtuple
+import time
+
+import psycopg
+from psycopg import sql
+
+import snapshot
+
+
+class LoadResult(
+    namedtuple(
+        "LoadResult",
+        ["table", "rows", "inserted", "updated", "unchanged", "periods", "seconds", "method"],
+    )
+):
+    """
+    The outcome of an upsert(): rows sent, how many of them were inserted, updated or left as
+    they were, the periods of those inserted or updated, and how long it took.
+    """
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+    def __str__(self):
+        summary = (
+            f"{self.table}: {self.rows} rows loaded, {self.inserted} inserted, "
+            f"{self.updated} updated, {self.unchanged} unchanged"
+        )
+        if self.periods:
+            summary += f" ({min(self.periods)} to {max(self.periods)})"
+        if self.method:
+            summary += f", written in {self.seconds:.3f}s ({self.method})"
+        else:
+            summary += f", nothing to write, in {self.seconds:.3f}s"
+        return summary
+
+
+def upsert(conn, table: str, columns: list, key: list, rows: list, method: str = "copy"):
+    """
+    Insert *rows* (tuples of values for *columns*, which include period) into *table*, and
+    return a LoadResult.
+
+    If *table* has a preliminary column, a row that conflicts with an existing one on *key*
+    replaces it **if and only if** the existing row is preliminary (table.preliminary is true)
+    and the new one isn't (excluded.preliminary is false), and otherwise is ignored. If it
+    doesn't, a conflicting row replaces the existing one if any of its other values differ, so
+    that revised figures are stored.
+
+    The keys (and preliminary flags or other values) of the rows already in *table* for the range
+    of periods in *rows* are read first, in a single query, and only the rows that would be inserted or update
+    an existing one are written; when nothing has changed, nothing is written.
+
+    With *method* "copy", those rows are COPYed into a temporary staging table and then inserted
+    with a single INSERT ... SELECT, so the whole batch costs a few round trips. If the server
+    (or a pooler in front of it) doesn't support that, or with *method* "pipeline", each row is
+    inserted with its own statement, but in pipeline mode, so they're sent without waiting for
+    each other's results. Either way, the statements keep their ON CONFLICT clauses, so rows
+    written by something else since they were read are still handled by the rules above.
+
+    If *conn* is a snapshot.Connection, they're instead inserted with SQLite's own INSERT ...
+    ON CONFLICT (and *method* is ignored).
+    """
+    start = time.perf_counter()
+    inserts, updates = diff(conn, table, columns, key, rows)
+    changes = inserts + updates
+    period = columns.index("period")
+    periods = sorted({row[period] for row in changes})
+    unchanged = len(rows) - len(changes)
+    if not changes:
+        seconds = time.perf_counter() - start
+        return LoadResult(table, len(rows), 0, 0, unchanged, periods, seconds, None)
+
+    if isinstance(conn, snapshot.Connection):
+        # (SQLite runs in-process, so there are no round trips to save)
+        snapshot.insert(conn, table, columns, key, changes)
+        method = "snapshot"
+    else:
+        method = _upsert(conn, table, columns, key, changes, method)
+
+    seconds = time.perf_counter() - start
+    return LoadResult(
+        table, len(rows), len(inserts), len(updates), unchanged, periods, seconds, method
+    )
+
+
+def diff(conn, table: str, columns: list, key: list, rows: list) -> tuple:
+    """
+    Compare *rows* with those already in *table*, and return those that are new and those that
+    replace an existing row (see upsert()), as two lists.
+
+    Rows with the same key are combined as if they were inserted in turn: a new preliminary row
+    followed by a final one is inserted as the final one, and so on.
+    """
+    if not rows:
+        return [], []
+    has_preliminary = "preliminary" in columns
+    key_indexes = [columns.index(column) for column in key]
+    period = columns.index("period")
+    preliminary = columns.index("preliminary") if has_preliminary else None
+    # (without a preliminary column, rows are compared on everything else instead)
+    values = [] if has_preliminary else [column for column in columns if column not in key]
+    value_indexes = [columns.index(column) for column in values]
+
+    selected = key + (["preliminary"] if has_preliminary else values)
+    first = min(row[period] for row in rows)
+    last = max(row[period] for row in rows)
+    if isinstance(conn, snapshot.Connection):
+        cur = snapshot.select(conn, table, selected, first, last)
+    else:
+        # (enums are read as strings, like the values they're loaded from)
+        cur = conn.execute(
+            sql.SQL("SELECT {columns} FROM {table} WHERE period BETWEEN %s AND %s").format(
+                columns=sql.SQL(", ").join(map(sql.Identifier, selected)),
+                table=sql.Identifier(table),
+            ),
+            (first, last),
+        )
+    # key: whether that row is preliminary, or the rest of its values
+    existing = {
+        row[: len(key)]: row[len(key)] if has_preliminary else row[len(key) :] for row in cur
+    }
+
+    # key: the row to write, for rows new to the table and those replacing one
+    inserts = {}
+    updates = {}
+    for row in rows:
+        row_key = tuple(row[i] for i in key_indexes)
+        row_values = tuple(row[i] for i in value_indexes)
+        if row_key not in existing:
+            inserts[row_key] = row
+        elif (has_preliminary and existing[row_key] and not row[preliminary]) or (
+            not has_preliminary and existing[row_key] != row_values
+        ):
+            (inserts if row_key in inserts else updates)[row_key] = row
+        else:
+            continue
+        existing[row_key] = row[preliminary] if has_preliminary else row_values
+    return list(inserts.values()), list(updates.values())
+
+
+def _upsert(conn, table: str, columns: list, key: list, rows: list, method: str) -> str:
+    """Write *rows* to *table* in Postgres (see upsert()), and return the method used."""
+    set_columns = [column for column in columns if column not in key]
+    updates = sql.SQL(", ").join(
+        sql.SQL("{column} = excluded.{column}").format(column=sql.Identifier(column))
+        for column in set_columns
+    )
+    if "preliminary" in columns:
+        condition = sql.SQL("{table}.preliminary = 't' AND excluded.preliminary = 'f'").format(
+            table=sql.Identifier(table)
+        )
+    else:
+        condition = sql.SQL(" OR ").join(
+            sql.SQL("{table}.{column} IS DISTINCT FROM excluded.{column}").format(
+                table=sql.Identifier(table), column=sql.Identifier(column)
+            )
+            for column in set_columns
+        )
+    conflict = sql.SQL("""
+        DO UPDATE
+        SET {updates}
+        WHERE {condition}
+        """).format(updates=updates, condition=condition)
+
+    if method == "copy":
+        # (in a savepoint, so that the transaction can carry on without it if it fails)
+        conn.execute("SAVEPOINT upsert")
+        try:
+            _upsert_copy(conn, table, columns, key, rows, conflict)
+            conn.execute("RELEASE SAVEPOINT upsert")
+        except psycopg.NotSupportedError:
+            conn.execute("ROLLBACK TO SAVEPOINT upsert")
+            method = "pipeline"
+    if method == "pipeline":
+        _upsert_pipeline(conn, table, columns, key, rows, conflict)
+    return method
+
+
+def _upsert_copy(conn, table: str, columns: list, key: list, rows: list, conflict):
+    staging = sql.Identifier(table + "_staging")
+    column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+    conn.execute(
+        sql.SQL("CREATE TEMP TABLE {staging} AS SELECT {columns} FROM {table} WITH NO DATA").format(
+            staging=staging, columns=column_list, table=sql.Identifier(table)
+        )
+    )
+    with conn.cursor().copy(
+        sql.SQL("COPY {staging} ({columns}) FROM STDIN").format(
+            staging=staging, columns=column_list
+        )
+    ) as copy:
+        for row in rows:
+            copy.write_row(row)
+    conn.execute(
+        sql.SQL("""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM {staging}
+            ON CONFLICT ({key})
+            """).format(
+            table=sql.Identifier(table),
+            columns=column_list,
+            staging=staging,
+            key=sql.SQL(", ").join(map(sql.Identifier, key)),
+        )
+        + conflict
+    )
+    conn.execute(sql.SQL("DROP TABLE {staging}").format(staging=staging))
+
+
+def _upsert_pipeline(conn, table: str, columns: list, key: list, rows: list, conflict):
+    query = sql.SQL("""
+        INSERT INTO {table} ({columns})
+        VALUES ({placeholders})
+        ON CONFLICT ({key})
+        """).format(
+        table=sql.Identifier(table),
+        columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        placeholders=sql.SQL(", ").join(sql.Placeholder() * len(columns)),
+        key=sql.SQL(", ").join(map(sql.Identifier, key)),
+    )
+    with conn.pipeline():
+        cur = conn.cursor()
+        cur.executemany(query + conflict, rows)
+
+
+def update_complete_periods(conn, table: str, periods, num_areas: int):
+    """
+    Record which of *periods* now have data for all *num_areas* areas in *table*.
+
+    Only *periods* (those just loaded) are checked, so the cost depends on the size of the load
+    rather than of the table. Call this in the same transaction as the changes themselves.
+    """
+    if isinstance(conn, snapshot.Connection):
+        return snapshot.update_complete_periods(conn, table, periods, num_areas)
+    conn.execute(
+        sql.SQL("""
+            INSERT INTO complete_periods (table_name, period)
+            SELECT %s, period
+            FROM {table}
+            WHERE period = ANY(%s)
+            GROUP BY period
+            HAVING COUNT(area) = %s
+            ON CONFLICT DO NOTHING
+            """).format(table=sql.Identifier(table)),
+        (table, list(periods), num_areas),
+    )
+
+
+def bump_data_version(conn, table: str):
+    """
+    Record that *table* has changed, so that the API stops serving responses it has cached for it.
+
+    The most recent period in the table is recorded alongside the version; the API uses both in
+    the ETag and Last-Modified headers of its responses.
+
+    Call this in the same transaction as the changes themselves, so that the new version is only
+    visible once they have been committed.
+    """
+    if isinstance(conn, snapshot.Connection):
+        return snapshot.bump_data_version(conn, table)
+    conn.execute(
+        sql.SQL("""
+            INSERT INTO data_version (table_name, version, updated_at, max_period)
+            VALUES (%s, 1, now(), (SELECT max(period) FROM {table}))
+            ON CONFLICT (table_name)
+            DO UPDATE
+            SET
+                version = data_version.version + 1,
+                updated_at = excluded.updated_at,
+                max_period = excluded.max_period
+            """).format(table=sql.Identifier(table)),
+        (table,),
+    )
@@ -0,0 +1,239 @@
+"""
+HTTP requests shared by the scripts in this directory.
+
+All requests go through a single Session, so connections to each host are kept alive and reused
+(including across threads, up to POOL_SIZE connections per host). Failed connections and
+responses with a RETRY_STATUSES status are retried up to RETRIES times, with exponential backoff.
+That includes POSTs, which here are only ever BLS API queries, and so safe to repeat.
+
+Successful responses are recorded on disk, in HTTP_CACHE_DIR (http_cache/ by default), keyed by
+the request (method, URL and, for POSTs, the payload without its API key). A recorded GET
+response is revalidated with a conditional request (If-None-Match/If-Modified-Since) when the
+server gave it an ETag or Last-Modified, so an unchanged file isn't downloaded again. Any recorded
+response younger than HTTP_CACHE_MAX_AGE seconds (0 by default) is used without a request at all.
+
+In "replay" mode (set_mode("replay"), or --replay on the command line of the scripts), requests
+are never sent: every response comes from those recorded, and a request without one fails. This
+makes runs deterministic, fast, and possible offline, and doesn't use any BLS API quota.
+
+HTTP_CACHE_DIR and HTTP_CACHE_MAX_AGE can be set in config.py.
+
+The bytes received from each host (not counting recorded responses) are counted in
+received_bytes, for run_all.py's metrics.
+"""
+
+from datetime import datetime, timezone
+import hashlib
+import json
+from pathlib import Path
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+try:
+    import config
+except ImportError:
+    # (config.py isn't needed if just trying to create the housing CSV)
+    config = None
+
+POOL_SIZE = 16
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+HTTP_CACHE_DIR = Path(
+    getattr(config, "HTTP_CACHE_DIR", Path(__file__).resolve().parent / "http_cache")
+)
+HTTP_CACHE_MAX_AGE = getattr(config, "HTTP_CACHE_MAX_AGE", 0)
+
+# "record" (send requests, revalidating and recording responses) or "replay" (only use recorded
+# responses)
+mode = "record"
+
+# host: bytes of response bodies received from it
+received_bytes = {}
+_received_lock = threading.Lock()
+
+
+class FetchError(Exception):
+    """Data couldn't be fetched from its source."""
+
+
+class Response:
+    """A response, either just received or recorded."""
+
+    def __init__(self, status_code: int, headers, content: bytes, fetched_at: float = None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.fetched_at = fetched_at or datetime.now(timezone.utc).timestamp()
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+session = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections=POOL_SIZE,
+    pool_maxsize=POOL_SIZE,
+    max_retries=Retry(
+        total=RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        # (urllib3 only retries idempotent methods by default)
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+        # hand the final response back rather than raising, so it's reported like any other
+        raise_on_status=False,
+    ),
+)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+
+def set_mode(new_mode: str):
+    global mode
+    if new_mode not in ["record", "replay"]:
+        raise ValueError("mode must be either 'record' or 'replay'")
+    mode = new_mode
+
+
+def count_received(url: str, content: bytes):
+    host = urlsplit(url).hostname
+    with _received_lock:
+        received_bytes[host] = received_bytes.get(host, 0) + len(content)
+
+
+def cache_key(method: str, url: str, payload: dict = None) -> str:
+    request = {"method": method, "url": url}
+    if payload is not None:
+        request["payload"] = {k: v for k, v in payload.items() if k != "registrationkey"}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def read_cache(key: str):
+    """Get the Response recorded under *key*, or None if there isn't one."""
+    try:
+        with open(HTTP_CACHE_DIR / (key + ".json")) as f:
+            meta = json.load(f)
+        content = (HTTP_CACHE_DIR / (key + ".body")).read_bytes()
+    except FileNotFoundError:
+        return None
+    return Response(200, meta["headers"], content, meta["fetched_at"])
+
+
+def write_cache(key: str, response: Response, request: dict):
+    """Record *response* under *key*, along with the *request* (for reference only)."""
+    HTTP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    headers = {
+        name: response.headers[name]
+        for name in ["Content-Type", "ETag", "Last-Modified"]
+        if name in response.headers
+    }
+    meta = {"request": request, "headers": headers, "fetched_at": response.fetched_at}
+    # (written to temporary files first, so an interrupted run can't leave a partial entry)
+    for suffix, data in [(".body", response.content), (".json", json.dumps(meta).encode())]:
+        path = HTTP_CACHE_DIR / (key + suffix)
+        tmp_path = path.with_suffix(suffix + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+
+def fresh(response: Response) -> bool:
+    age = datetime.now(timezone.utc).timestamp() - response.fetched_at
+    return age < HTTP_CACHE_MAX_AGE
+
+
+def will_post(url: str, payload: dict) -> bool:
+    """
+    Determine if post_json() would send a request for *payload* to *url*, rather than return a
+    recorded response.
+    """
+    if mode == "replay":
+        return False
+    cached = read_cache(cache_key("POST", url, payload))
+    return not (cached and fresh(cached))
+
+
+def post_json(url: str, payload: dict, is_valid=None) -> dict:
+    """
+    POST *payload* as JSON to *url* and return the JSON response.
+
+    If *is_valid* is given, the response is only recorded if it returns true for the decoded
+    response (e.g. to avoid recording an API's error messages).
+    """
+    key = cache_key("POST", url, payload)
+    cached = read_cache(key)
+    if mode == "replay":
+        if cached is None:
+            raise FetchError(f"No recorded response for {url} ({key}).")
+        return cached.json()
+    if cached and fresh(cached):
+        return cached.json()
+
+    try:
+        r = session.post(url, json=payload)
+    except requests.RequestException as e:
+        raise FetchError(f"Unable to fetch data from {url}: {e}")
+    count_received(url, r.content)
+    if r.status_code != 200:
+        raise FetchError(f"Unable to fetch data from {url}.")
+    response = Response(r.status_code, r.headers, r.content)
+    data = response.json()
+    if is_valid is None or is_valid(data):
+        write_cache(key, response, {"method": "POST", "url": url})
+    return data
+
+
+def get(url: str, headers: dict = None, **kwargs) -> Response:
+    """
+    GET *url* (with any of requests.get()'s *kwargs*).
+
+    If the caller sends its own conditional request *headers*, a 304 (Not Modified) response is
+    returned like a 200. Otherwise, the recorded response is revalidated (if possible) and
+    returned if it's still current.
+    """
+    headers = dict(headers or {})
+    conditional = "If-None-Match" in headers or "If-Modified-Since" in headers
+    key = cache_key("GET", url)
+    cached = read_cache(key)
+
+    if mode == "replay":
+        if cached is None:
+            raise FetchError(f"No recorded response for {url} ({key}).")
+        if conditional and headers.get("If-None-Match") == cached.headers.get("ETag"):
+            return Response(304, cached.headers, b"", cached.fetched_at)
+        return cached
+
+    if cached and not conditional:
+        if fresh(cached):
+            return cached
+        if "ETag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        if "Last-Modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+    try:
+        r = session.get(url, headers=headers, **kwargs)
+    except requests.RequestException as e:
+        raise FetchError(f"Unable to get {url}: {e}")
+    count_received(url, r.content)
+
+    if r.status_code == 304:
+        if conditional:
+            return Response(304, r.headers, b"")
+        # (recorded again, so that it's fresh from now)
+        response = Response(200, cached.headers, cached.content)
+    elif r.status_code == 200:
+        response = Response(r.status_code, r.headers, r.content)
+    else:
+        raise FetchError(f"Unable to get {url}.")
+    write_cache(key, response, {"method": "GET", "url": url})
+    return response
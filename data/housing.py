@@ -1,125 +1,270 @@
 """
-Combine county-level authorized housing units into region-wide total from monthly data provided
-via text files by U.S. Dept. of Census.
+Load county-level authorized housing units, and combine them into the region-wide total, from
+monthly data provided via text files by U.S. Dept. of Census.
+
+Every county's units are kept (in the housing_county table), so totals for other regions can be
+summed from them (see region_county in create_tables.sql) without loading anything again.
 
 If --csv is passed to the program (python3 housing.py --csv), it will create a CSV of
 the fetched data. Otherwise, it will insert it into the database specified in the PG_CREDS
-variable in config.py.
+variable in config.py. With --snapshot PATH, it will load it into the snapshot at PATH
+(see snapshot.py) instead.
+
+Files already processed by a previous run are recorded in a manifest (housing_manifest.json), and
+are only downloaded again if they've changed since; --full ignores the manifest.
+
+The fetch, parse and load steps can also be imported and run by run_all.py.
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import csv
 from datetime import date
+import hashlib
+import json
 import logging
 from pathlib import Path
+import sqlite3
 import sys
 
 from bs4 import BeautifulSoup
 import psycopg
-import requests
 import urllib3
 
+from db import bump_data_version, upsert
+from fetch import FetchError, get, set_mode
+import snapshot
+
 logger = logging.getLogger()
 
 # Disable warnings about unverified https requests.
 urllib3.disable_warnings()
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--csv", action="store_true")
-args = parser.parse_args()
+table = "housing"
+
+# number of files downloaded at once
+DOWNLOAD_CONCURRENCY = 8
+
+MANIFEST = Path(__file__).resolve().parent / "housing_manifest.json"
+
+county_files_url = "https://www2.census.gov/econ/bps/County/"
+
+dvrpc_counties = {
+    "34005",
+    "34007",
+    "34015",
+    "34021",
+    "42017",
+    "42029",
+    "42045",
+    "42091",
+    "42101",
+}
+
+
+def list_files() -> dict:
+    """
+    Get the county data filenames, most recent first, along with the rest of their row in the
+    directory listing (last modified and size).
+    """
+    r = get(county_files_url + "?C=N;O=D", verify=False)
+
+    soup = BeautifulSoup(r.text, features="html.parser")
+    listing = soup.find("table")
+
+    county_files = {}
+
+    for row in listing.find_all("tr"):
+        cells = row.find_all("td")
+        for i, cell in enumerate(cells):
+            if cell.a:
+                if cell.a.string.endswith("c.txt"):
+                    county_files[cell.a.string] = [c.get_text(strip=True) for c in cells[i + 1 :]]
+
+    # Limit to last 3 years of files.
+    return dict(list(county_files.items())[:36])
 
-# We don't need a database connection if just trying to create a CSV.
-if args.csv:
-    PG_CREDS = ""
-else:
-    from config import PG_CREDS
 
-# Get the county data filenames.
-url_to_scrape = "https://www2.census.gov/econ/bps/County/?C=N;O=D"
-r = requests.get(url_to_scrape, verify=False)
-
-if r.status_code != 200:
-    sys.exit(f"Unable to get {url_to_scrape}")
-
-soup = BeautifulSoup(r.text, features="html.parser")
-table = soup.find("table")
-
-county_files = []
-
-for row in table.find_all("tr"):
-    for cell in row:
-        if cell.a:
-            if cell.a.string.endswith("c.txt"):
-                county_files.append(cell.a.string)
-
-# Limit to last 3 years of files.
-county_files = county_files[:36]
-
-# Interate through the files and create a dictionary of date: total.
-data = {}
-for file in county_files:
-    url = "https://www2.census.gov/econ/bps/County/" + file
-    with requests.get(url, stream=True, verify=False) as r:
-        lines = (line.decode("utf-8") for line in r.iter_lines())
-        # Skip the first three lines of the file.
-        lines.__next__()
-        lines.__next__()
-        lines.__next__()
-
-        for row in csv.reader(lines):
-            # Only include rows that contain non-DVRPC counties.
-            # Ignore data, by line, if there's an error in type or type conversion, but log it.
-            try:
-                if row[1] + row[2] in [
-                    "34005",
-                    "34007",
-                    "34015",
-                    "34021",
-                    "42017",
-                    "42029",
-                    "42045",
-                    "42091",
-                    "42101",
-                ]:
-                    try:
-                        data[row[0]] = (
-                            data[row[0]] + int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
-                        )
-                    except KeyError:
-                        try:
-                            data[row[0]] = int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
-                        except Exception as e:
-                            logger.error(f"Error in {file} for {row[0]}, {row[1]}{row[2]}: {e}")
-                    except Exception as e:
-                        logger.error(f"Error in {file} for {row[0]}, {row[1]}{row[2]}: {e}")
-            except IndexError:
-                logger.error("Cannot read columns 1 and/or 2 in row")
-
-# Convert to list, and then the date from YYYY-MM string to proper date.
-data = [[key, value] for key, value in data.items()]
-for each in data:
-    each[0] = date.fromisoformat(each[0][:4] + "-" + each[0][4:] + "-01")
-data.reverse()
-
-# Enter into db or create CSV.
-if not args.csv:
+def load_manifest(path: Path) -> dict:
+    """Get the manifest of processed files (filename: entry; see fetch_file()) at *path*."""
     try:
-        with psycopg.connect(PG_CREDS) as conn:
-            for record in data:
-                conn.execute(
-                    """
-                        INSERT INTO housing (period, units)
-                        VALUES (%s, %s)
-                        ON CONFLICT DO NOTHING
-                    """,
-                    (
-                        record[0],
-                        record[1],
-                    ),
-                )
-    except psycopg.OperationalError:
-        sys.exit("Database error.")
-else:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(path: Path, manifest: dict):
+    # (written to a temporary file first, so an interrupted run can't leave a partial manifest)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(path)
+
+
+def fetch(concurrency: int = DOWNLOAD_CONCURRENCY, manifest_path: Path = MANIFEST) -> dict:
+    """
+    Download the county data files, *concurrency* at a time, parsing each as soon as it's been
+    downloaded, and get the totals by month of each file, in the order they were listed.
+
+    Files recorded in the manifest at *manifest_path* whose row in the directory listing hasn't
+    changed aren't downloaded again, and their totals are taken from the manifest. The manifest is
+    then updated with the files that were. If *manifest_path* is None, every file is downloaded.
+    """
+    listing = list_files()
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+    entries = {
+        file: manifest[file]
+        for file, listed in listing.items()
+        if file in manifest and manifest[file]["listed"] == listed
+    }
+    # (entries from before county totals were recorded are treated as changed)
+    entries = {file: entry for file, entry in entries.items() if "county_totals" in entry}
+    changed = [file for file in listing if file not in entries]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        fetched = executor.map(lambda file: fetch_file(file, manifest.get(file)), changed)
+        for file, entry in zip(changed, fetched):
+            entries[file] = dict(entry, listed=listing[file])
+
+    logger.info(f"{len(changed)} of {len(listing)} county files new or changed")
+    if manifest_path:
+        # (only the listed files are kept, so older ones drop out of the manifest)
+        save_manifest(manifest_path, {file: entries[file] for file in listing})
+    return {file: entries[file]["county_totals"] for file in listing}
+
+
+def fetch_file(file: str, entry: dict = None) -> dict:
+    """
+    Download and parse a county data file, and return its manifest entry: the file's size,
+    ETag, Last-Modified and SHA-256 hash, and its totals by month and county.
+
+    If there's an *entry* for it from a previous run, the file is requested conditionally (and
+    not parsed again if it hasn't changed).
+    """
+    # (an entry from before county totals were recorded has nothing to reuse, so the file is
+    # requested and parsed as if it were new)
+    if entry and "county_totals" not in entry:
+        entry = None
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = get(county_files_url + file, verify=False, headers=headers)
+    if r.status_code == 304:
+        return dict(entry)
+
+    sha256 = hashlib.sha256(r.content).hexdigest()
+    if entry and entry["sha256"] == sha256:
+        totals = entry["county_totals"]
+    else:
+        totals = parse_file(file, r.content.decode("utf-8").splitlines())
+    return {
+        "size": len(r.content),
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "sha256": sha256,
+        "county_totals": totals,
+    }
+
+
+def parse_file(file: str, lines: list) -> dict:
+    """
+    Create a dictionary of date: {county FIPS code: total} from the lines of a county data file.
+
+    Lines are split on commas directly; only those with a quoted field (a county name with a comma
+    in it) need the csv module.
+    """
+    data = {}
+    bad_lines = 0
+    month = None
+    # Skip the first three lines of the file.
+    for line in lines[3:]:
+        row = next(csv.reader([line])) if '"' in line else line.split(",")
+        # Ignore data, by line, if there's an error in type or type conversion, but log it.
+        if len(row) < 3:
+            logger.error(f"Cannot read columns 1 and/or 2 in {file}: {line!r}")
+            bad_lines += 1
+            continue
+        try:
+            units = int(row[7]) + int(row[10]) + int(row[13]) + int(row[16])
+        except (IndexError, ValueError) as e:
+            logger.error(f"Error in {file} for {row[0]}, {row[1]}{row[2]}: {e}")
+            bad_lines += 1
+            continue
+        # (a file is all one month, as a rule, so its counties are only looked up when it changes)
+        if row[0] != month:
+            month = row[0]
+            counties = data.setdefault(month, {})
+        fips = row[1] + row[2]
+        if fips in counties:
+            counties[fips] += units
+        else:
+            counties[fips] = units
+
+    if bad_lines:
+        logger.warning(f"{bad_lines} lines in {file} could not be read")
+    return data
+
+
+def parse(file_totals: dict) -> list:
+    """Combine the totals of each file into a list of [date, county FIPS code, total]."""
+    # (in the order the files were listed, so the result doesn't depend on which finished first)
+    data = {}
+    for totals in file_totals.values():
+        for month, counties in totals.items():
+            for fips, units in counties.items():
+                data[month, fips] = data.get((month, fips), 0) + units
+
+    # Convert to list, and then the date from YYYY-MM string to proper date.
+    data = [
+        [date.fromisoformat(month[:4] + "-" + month[4:] + "-01"), fips, units]
+        for (month, fips), units in data.items()
+    ]
+    data.sort()
+    return data
+
+
+def region_totals(data: list, counties: set = dvrpc_counties) -> list:
+    """Sum the county totals in *data* into a list of [date, total] for *counties*."""
+    totals = {}
+    for period, fips, units in data:
+        if fips in counties:
+            totals[period] = totals.get(period, 0) + units
+    return [[period, units] for period, units in sorted(totals.items())]
+
+
+def load(conn, data: list):
+    """
+    Add *data* to the database, update the DVRPC Region's totals for the periods that changed,
+    and return the LoadResult.
+    """
+    result = upsert(conn, "housing_county", ["period", "fips", "units"], ["period", "fips"], data)
+    if not result.changed:
+        return result
+    conn.execute(
+        """
+        INSERT INTO housing (period, units)
+        SELECT period, sum(units)
+        FROM housing_county
+        JOIN region_county USING (fips)
+        WHERE region = 'DVRPC Region' AND period = ANY(%s)
+        GROUP BY period
+        ON CONFLICT (period)
+        DO UPDATE
+        SET units = excluded.units
+        WHERE housing.units <> excluded.units
+        """,
+        (result.periods,),
+    )
+    bump_data_version(conn, table)
+    return result
+
+
+def write_csv(data: list):
     results_dir = "results"
     try:
         Path(results_dir).mkdir()
@@ -129,6 +274,53 @@ else:
     with open(results_dir + "/housing.csv", "w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["period", "units"])
+        writer.writerows(region_totals(data))
+
+    with open(results_dir + "/housing_county.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["period", "fips", "units"])
         writer.writerows(data)
 
-    print("CSV created in results/ directory.")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--snapshot", help="load into the snapshot at this path")
+    parser.add_argument("--replay", action="store_true", help="only use recorded responses")
+    parser.add_argument("--concurrency", type=int, default=DOWNLOAD_CONCURRENCY)
+    parser.add_argument("--full", action="store_true", help="download every file")
+    args = parser.parse_args()
+    if args.replay:
+        set_mode("replay")
+
+    try:
+        data = parse(fetch(args.concurrency, None if args.full else MANIFEST))
+    except FetchError as e:
+        sys.exit(str(e))
+
+    # Enter into db or create CSV.
+    if args.csv:
+        write_csv(data)
+        print("CSV created in results/ directory.")
+        return
+
+    if args.snapshot:
+        try:
+            with snapshot.connect(args.snapshot) as conn:
+                print(load(conn, data))
+        except sqlite3.OperationalError as e:
+            sys.exit(f"Snapshot error: {e}")
+        return
+
+    # (We don't need a database connection if just trying to create a CSV.)
+    from config import PG_CREDS
+
+    try:
+        with psycopg.connect(PG_CREDS) as conn:
+            print(load(conn, data))
+    except psycopg.OperationalError:
+        sys.exit("Database error.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,37 +3,35 @@ Fetch employment by industry data (CES) from BLS's API.
 
 If --csv is passed to the program (python3 industry_employment.py --csv), it will create a CSV of
 the fetched data. Otherwise, it will insert it into the database specified in the PG_CREDS
-variable in config.py.
+variable in config.py. With --snapshot PATH, it will load it into the snapshot at PATH
+(see snapshot.py) instead.
+
+The fetch, parse, transform and load steps can also be imported and run by run_all.py.
 """
 
 import argparse
 import csv
 from datetime import date
-import json
 from pathlib import Path
+import sqlite3
 import sys
-from typing import List
 
 import psycopg
-import requests
-
-from config import BLS_API_KEY
-
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--csv", action="store_true")
-args = parser.parse_args()
-
-# we don't need a database connection if just trying to create a CSV
-if args.csv:
-    PG_CREDS = ""
-else:
-    from config import PG_CREDS
+import bls
+from db import bump_data_version, upsert
+from fetch import FetchError, set_mode
+import snapshot
+from transforms import change, drop_lag_years, lagged_values, percent_change
 
+table = "employment_by_industry"
 
 trenton = "SMU3445940"
 philadelphia = "SMU4237980"
 
+# years before the first one loaded that are needed to calculate the changes (see transform())
+LAG_YEARS = 2
+
 industries = {
     "0000000001": "Total Nonfarm",
     "1500000001": "Mining, Logging, and Construction",
@@ -48,154 +46,168 @@ industries = {
     "9000000001": "Government",
 }
 
-series: List = []
-for industry in industries.keys():
-    series.append(trenton + industry)
-    series.append(philadelphia + industry)
-
-# Get data from API
-headers = {"Content-type": "application/json"}
-data = json.dumps(
-    {
-        "seriesid": series,
-        "registrationkey": BLS_API_KEY,
-    }
-)
-
-p = requests.post("https://api.bls.gov/publicAPI/v2/timeseries/data/", data=data, headers=headers)
-if p.status_code != 200:
-    sys.exit("Unable to fetch data from BLS API.")
-
-json_data = json.loads(p.text)
-
-cleaned_data = []
-
-for series in json_data["Results"]["series"]:
-    if series["seriesID"][:10] == trenton:
-        area = "Trenton MSA"
-    if series["seriesID"][:10] == philadelphia:
-        area = "Philadelphia MSA"
-    industry = industries[series["seriesID"][10:]]
-
-    for record in series["data"]:
-        period = date.fromisoformat(record["year"] + "-" + (str(record["period"][1:]) + "-01"))
-
-        # determine if preliminary data
-        for each in record["footnotes"]:
-            preliminary = True if each.get("code") == "P" else False
-
-        cleaned_data.append(
-            {
-                "period": period,
-                "area": area,
-                "industry": industry,
-                "jobs": record["value"],
-                "preliminary": preliminary,
-            }
-        )
-
-for record in cleaned_data:
-    one_year_ago = date(record["period"].year - 1, record["period"].month, record["period"].day)
-    two_years_ago = date(record["period"].year - 2, record["period"].month, record["period"].day)
+
+def fetch(start_year: int = None, end_year: int = None) -> list:
+    """
+    Get the series for each industry in each area from BLS's API, for bls.DEFAULT_YEARS unless
+    given, and the LAG_YEARS before them.
+    """
+    series = []
+    for industry in industries.keys():
+        series.append(trenton + industry)
+        series.append(philadelphia + industry)
+    return bls.fetch(series, start_year, end_year, LAG_YEARS)
+
+
+def parse(series_list: list) -> list:
+    """Create list of dictionaries from data."""
+    cleaned_data = []
+    for series in series_list:
+        if series["seriesID"][:10] == trenton:
+            area = "Trenton MSA"
+        if series["seriesID"][:10] == philadelphia:
+            area = "Philadelphia MSA"
+        industry = industries[series["seriesID"][10:]]
+
+        for record in series["data"]:
+            cleaned_data.append(
+                {
+                    "period": bls.period(record),
+                    "area": area,
+                    "industry": industry,
+                    "jobs": record["value"],
+                    "preliminary": bls.preliminary(record),
+                }
+            )
+    return cleaned_data
+
+
+def transform(cleaned_data: list) -> list:
+    """
+    Calculate and add the 1- and 2-year change and percentage change, and then drop the LAG_YEARS
+    fetched only to calculate them.
+    """
     # get previous years' jobs, or None if not available (before start of data)
-    one_year_ago_jobs = next(
-        (
-            item["jobs"]
-            for item in cleaned_data
-            if item["period"] == one_year_ago
-            and item["area"] == record["area"]
-            and item["industry"] == record["industry"]
-        ),
-        None,
+    one_year_ago_jobs = lagged_values(cleaned_data, "jobs", ["area", "industry"], 1)
+    two_years_ago_jobs = lagged_values(cleaned_data, "jobs", ["area", "industry"], 2)
+    for record, one_year_ago, two_years_ago in zip(
+        cleaned_data, one_year_ago_jobs, two_years_ago_jobs
+    ):
+        record["change1year"] = change(record["jobs"], one_year_ago, 2)
+        record["percentchange1year"] = percent_change(record["jobs"], one_year_ago, 1)
+        record["change2year"] = change(record["jobs"], two_years_ago, 2)
+        record["percentchange2year"] = percent_change(record["jobs"], two_years_ago, 1)
+    return drop_lag_years(cleaned_data, LAG_YEARS)
+
+
+def load(conn, cleaned_data: list):
+    """
+    Add *cleaned_data* to the database and, if anything changed (or the summary is missing),
+    rebuild the summary; return the LoadResult.
+    """
+    # Insert new records, or update them if data is no longer preliminary.
+    result = upsert(
+        conn,
+        table,
+        [
+            "period",
+            "area",
+            "industry",
+            "number",
+            "change1year",
+            "percentchange1year",
+            "change2year",
+            "percentchange2year",
+            "preliminary",
+        ],
+        ["period", "area", "industry"],
+        [
+            (
+                record["period"],
+                record["area"],
+                record["industry"],
+                record["jobs"],
+                record["change1year"],
+                record["percentchange1year"],
+                record["change2year"],
+                record["percentchange2year"],
+                record["preliminary"],
+            )
+            for record in cleaned_data
+        ],
     )
-    two_years_ago_jobs = next(
-        (
-            item["jobs"]
-            for item in cleaned_data
-            if item["period"] == two_years_ago
-            and item["area"] == record["area"]
-            and item["industry"] == record["industry"]
-        ),
-        None,
+    # (the summary is also built if it's empty but the data isn't, e.g. in a database set up
+    # since the data was last loaded, rather than waiting for BLS to publish something new)
+    if result.changed or summary_missing(conn):
+        rebuild_summary(conn)
+        bump_data_version(conn, table)
+    return result
+
+
+def summary_missing(conn) -> bool:
+    """Determine if the summary is empty while there's data to build it from."""
+    cur = conn.execute("""
+        SELECT
+            NOT EXISTS (SELECT 1 FROM employment_by_industry_summary)
+            AND EXISTS (SELECT 1 FROM employment_by_industry)
+    """)
+    return bool(cur.fetchone()[0])
+
+
+def rebuild_summary(conn):
+    """
+    Rebuild the summary served by the API: each industry in each area for the most recent period
+    and the period a year before it, along with its share of the area's total nonfarm employment.
+    """
+    # (rather than max(period), so that SQLite reads it as a date too; see snapshot.py)
+    cur = conn.execute("SELECT period FROM employment_by_industry ORDER BY period DESC LIMIT 1")
+    most_recent = cur.fetchone()[0]
+    year_ago = date(most_recent.year - 1, most_recent.month, most_recent.day)
+    summary_data = conn.execute(
+        """
+        SELECT
+            period,
+            area,
+            industry,
+            number,
+            change1year,
+            percentchange1year,
+            change2year,
+            percentchange2year
+        FROM employment_by_industry
+        WHERE period IN (%s, %s)
+    """,
+        (most_recent, year_ago),
+    ).fetchall()
+    totals = {}
+    for row in summary_data:
+        if row[2] == "Total Nonfarm":
+            totals[(row[0], row[1])] = row[3]
+
+    conn.execute("DELETE FROM employment_by_industry_summary")
+    conn.cursor().executemany(
+        """
+        INSERT INTO employment_by_industry_summary
+            (   period,
+                area,
+                industry,
+                number,
+                share_of_total,
+                change1year,
+                percentchange1year,
+                change2year,
+                percentchange2year
+            )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+        [
+            (*row[:4], round(row[3] / totals[(row[0], row[1])] * 100, 1), *row[4:])
+            for row in summary_data
+        ],
     )
-    if type(one_year_ago_jobs) == type(None):
-        record["change1year"] = None
-        record["percentchange1year"] = None
-    else:
-        one_year_ago_jobs = float(one_year_ago_jobs)
-        change1year = float(record["jobs"]) - one_year_ago_jobs
-        percentchange1year = (change1year / one_year_ago_jobs) * 100
-        record["change1year"] = round(change1year, 2)
-        record["percentchange1year"] = round(percentchange1year, 1)
-    if type(two_years_ago_jobs) == type(None):
-        record["change2year"] = None
-        record["percentchange2year"] = None
-    else:
-        two_years_ago_jobs = float(two_years_ago_jobs)
-        change2year = float(record["jobs"]) - two_years_ago_jobs
-        percentchange2year = (change2year / two_years_ago_jobs) * 100
-        record["change2year"] = round(change2year, 2)
-        record["percentchange2year"] = round(percentchange2year, 1)
-
-# enter into db or create CSV
-if not args.csv:
-    try:
-        with psycopg.connect(PG_CREDS) as conn:
-            for record in cleaned_data:
-                # Insert new record or update rate/prelim if data is no longer preliminary.
-                # Further explanation:
-                # If a conflict on PERIOD and AREA (i.e. already a record for that
-                # period/area), then update the values for RATE and PRELIMINARY
-                # **if and only if**
-                # previous value for PRELIMINARY (employment_by_industry.preliminary) was true
-                # and current value for PRELIMINARY (excluded.preliminary) is false
-                conn.execute(
-                    """
-                    INSERT INTO employment_by_industry
-                        (   period,
-                            area,
-                            industry,
-                            number,
-                            change1year,
-                            percentchange1year,
-                            change2year,
-                            percentchange2year,
-                            preliminary
-                        )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (period, area, industry)
-                    DO UPDATE
-                    SET
-                        number = %s,
-                        change1year = %s,
-                        percentchange1year = %s,
-                        change2year = %s,
-                        percentchange2year = %s,
-                        preliminary = 'f'
-                    WHERE
-                        employment_by_industry.preliminary = 't' AND
-                        excluded.preliminary = 'f'
-                """,
-                    (
-                        record["period"],
-                        record["area"],
-                        record["industry"],
-                        record["jobs"],
-                        record["change1year"],
-                        record["percentchange1year"],
-                        record["change2year"],
-                        record["percentchange2year"],
-                        record["preliminary"],
-                        record["jobs"],
-                        record["change1year"],
-                        record["percentchange1year"],
-                        record["change2year"],
-                        record["percentchange2year"],
-                    ),
-                )
-    except psycopg.OperationalError:
-        sys.exit("Database error.")
-else:
+
+
+def write_csv(cleaned_data: list):
     results_dir = "results"
     try:
         Path(results_dir).mkdir()
@@ -230,4 +242,50 @@ else:
         writer.writerow(dict(zip(fieldnames, header)))
         writer.writerows(cleaned_data)
 
-    print("CSV created in results/ directory.")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--snapshot", help="load into the snapshot at this path")
+    parser.add_argument("--replay", action="store_true", help="only use recorded responses")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    args = parser.parse_args()
+    try:
+        bls.years(args.start_year, args.end_year)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.replay:
+        set_mode("replay")
+
+    try:
+        cleaned_data = transform(parse(fetch(args.start_year, args.end_year)))
+    except FetchError as e:
+        sys.exit(str(e))
+
+    # enter into db or create CSV
+    if args.csv:
+        write_csv(cleaned_data)
+        print("CSV created in results/ directory.")
+        return
+
+    if args.snapshot:
+        try:
+            with snapshot.connect(args.snapshot) as conn:
+                print(load(conn, cleaned_data))
+        except sqlite3.OperationalError as e:
+            sys.exit(f"Snapshot error: {e}")
+        return
+
+    # (we don't need a database connection if just trying to create a CSV)
+    from config import PG_CREDS
+
+    try:
+        with psycopg.connect(PG_CREDS) as conn:
+            print(load(conn, cleaned_data))
+    except psycopg.OperationalError:
+        sys.exit("Database error.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Prometheus metrics of run_all.py's runs, for alerting on slow or failed refreshes.
+
+After each run, these are written to METRICS_FILE (for node_exporter's textfile collector) and/or
+pushed to the Pushgateway at PUSHGATEWAY (e.g. "localhost:9091"), if either is set in config.py:
+
+  * econ_data_loader_stage_seconds{source, stage}: time taken by each step of each source
+  * econ_data_loader_rows{table, change}: rows loaded into each table ("fetched"), and of those,
+    how many were "inserted", "updated" (from preliminary) and "unchanged"
+  * econ_data_loader_http_bytes{host}: bytes received from each host (not counting recorded
+    responses)
+  * econ_data_loader_success{source}: 1 if the source was loaded, 0 if it failed
+  * econ_data_loader_duration_seconds: time taken by the whole run
+  * econ_data_loader_last_run_timestamp_seconds: when the run finished
+"""
+
+import sys
+
+from prometheus_client import CollectorRegistry, Gauge, push_to_gateway, write_to_textfile
+
+from db import LoadResult
+import fetch
+
+try:
+    import config
+except ImportError:
+    config = None
+
+METRICS_FILE = getattr(config, "METRICS_FILE", None)
+PUSHGATEWAY = getattr(config, "PUSHGATEWAY", None)
+
+
+def report(sources: list, timings: dict, results: dict, seconds: float):
+    """
+    Write or push the metrics of a run of *sources*, given the *timings* of each source's steps
+    and the *results* of loading them (see run_all.py). Sources without timings failed.
+    """
+    if not (METRICS_FILE or PUSHGATEWAY):
+        return
+
+    registry = CollectorRegistry()
+    stage_seconds = Gauge(
+        "econ_data_loader_stage_seconds",
+        "Time taken by each step of each source",
+        ["source", "stage"],
+        registry=registry,
+    )
+    rows = Gauge(
+        "econ_data_loader_rows",
+        "Rows loaded into each table",
+        ["table", "change"],
+        registry=registry,
+    )
+    http_bytes = Gauge(
+        "econ_data_loader_http_bytes", "Bytes received from each host", ["host"], registry=registry
+    )
+    success = Gauge(
+        "econ_data_loader_success", "Whether each source was loaded", ["source"], registry=registry
+    )
+    duration = Gauge(
+        "econ_data_loader_duration_seconds", "Time taken by the whole run", registry=registry
+    )
+    last_run = Gauge(
+        "econ_data_loader_last_run_timestamp_seconds", "When the run finished", registry=registry
+    )
+
+    for source in sources:
+        success.labels(source).set(source in timings)
+        for stage, stage_time in timings.get(source, {}).items():
+            stage_seconds.labels(source, stage).set(stage_time)
+    for result in results.values():
+        # (with --csv, there are no LoadResults)
+        if isinstance(result, LoadResult):
+            rows.labels(result.table, "fetched").set(result.rows)
+            rows.labels(result.table, "inserted").set(result.inserted)
+            rows.labels(result.table, "updated").set(result.updated)
+            rows.labels(result.table, "unchanged").set(result.unchanged)
+    for host, received in fetch.received_bytes.items():
+        http_bytes.labels(host).set(received)
+    duration.set(seconds)
+    last_run.set_to_current_time()
+
+    # (the data has been loaded by now, so failing to report on it shouldn't fail the run)
+    try:
+        if METRICS_FILE:
+            write_to_textfile(METRICS_FILE, registry)
+        if PUSHGATEWAY:
+            push_to_gateway(PUSHGATEWAY, job="econ_data_loaders", registry=registry)
+    except OSError as e:
+        print(f"Unable to report metrics: {e}", file=sys.stderr)
@@ -0,0 +1,149 @@
+"""
+Fetch data from all sources and load it into the database, in a single process.
+
+The sources are fetched, parsed and transformed concurrently, each in its own thread, so that
+waiting on BLS's API and the Census's files overlaps. Each is loaded as soon as it's ready, on a
+connection from a pool shared by all of them. The time taken by each step is reported for each
+source.
+
+    python3 run_all.py [--csv | --snapshot PATH] [--replay] [--sources cpi unemployment ...]
+        [--start-year YEAR] [--end-year YEAR]
+
+As with the individual scripts, --csv creates CSVs in results/ rather than using the database,
+--snapshot loads into a snapshot (see snapshot.py) instead of it, and --replay only uses
+recorded responses (see fetch.py) rather than sending any requests.
+
+Metrics of each run (each step's time, the rows loaded, bytes downloaded, and which sources
+failed) can be written to a file or pushed to a Prometheus Pushgateway; see metrics.py.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+import sqlite3
+import sys
+import time
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+import bls
+import cpi
+from fetch import FetchError, set_mode
+import housing
+import industry_employment
+import metrics
+import snapshot
+import unemployment
+
+sources = {module.__name__: module for module in [cpi, unemployment, industry_employment, housing]}
+# (those whose data comes from BLS's API, and can be fetched for a range of years)
+bls_sources = [cpi, unemployment, industry_employment]
+stages = ["fetch", "parse", "transform", "load"]
+
+
+def timed(timings: dict, stage: str, f, *args):
+    """Call *f* with *args*, recording how long it took as *stage* in *timings*."""
+    start = time.perf_counter()
+    result = f(*args)
+    timings[stage] = time.perf_counter() - start
+    return result
+
+
+def load(module, connect, data):
+    with connect() as conn:
+        return module.load(conn, data)
+
+
+def run(module, connect=None, years: tuple = ()) -> tuple:
+    """
+    Fetch, parse, transform and load the data from *module* on a connection from *connect* (a
+    pool's connection() or snapshot.connect(), or if there's none, write it to a CSV), and return
+    the time each step took and the LoadResult.
+
+    BLS data is fetched for *years* (start year, end year), if given.
+    """
+    timings = {}
+    fetch = partial(module.fetch, *years) if module in bls_sources else module.fetch
+    data = timed(timings, "fetch", fetch)
+    data = timed(timings, "parse", module.parse, data)
+    if hasattr(module, "transform"):
+        data = timed(timings, "transform", module.transform, data)
+    if connect:
+        result = timed(timings, "load", load, module, connect, data)
+    else:
+        result = timed(timings, "load", module.write_csv, data)
+    return timings, result
+
+
+def report(timings: dict):
+    print(f"{'source':<22}" + "".join(f"{stage:>11}" for stage in stages) + f"{'total':>11}")
+    for name, source_timings in timings.items():
+        row = f"{name:<22}"
+        for stage in stages:
+            row += f"{source_timings[stage]:>10.3f}s" if stage in source_timings else f"{'-':>11}"
+        print(row + f"{sum(source_timings.values()):>10.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--snapshot", help="load into the snapshot at this path")
+    parser.add_argument("--replay", action="store_true", help="only use recorded responses")
+    parser.add_argument("--sources", nargs="+", choices=sources, default=list(sources))
+    parser.add_argument("--start-year", type=int, help="first year of BLS data")
+    parser.add_argument("--end-year", type=int, help="last year of BLS data")
+    args = parser.parse_args()
+    try:
+        bls.years(args.start_year, args.end_year)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.replay:
+        set_mode("replay")
+
+    pool = None
+    if args.csv:
+        connect = None
+    elif args.snapshot:
+        connect = partial(snapshot.connect, args.snapshot)
+    else:
+        from config import PG_CREDS
+
+        pool = ConnectionPool(PG_CREDS, min_size=1, max_size=len(args.sources), open=True)
+        connect = pool.connection
+
+    start = time.perf_counter()
+    timings = {}
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(args.sources)) as executor:
+        years = (args.start_year, args.end_year)
+        futures = {
+            executor.submit(run, sources[name], connect, years): name for name in args.sources
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                timings[name], results[name] = future.result()
+            except (FetchError, psycopg.Error, sqlite3.Error) as e:
+                failed.append(name)
+                print(f"{name}: failed: {e}", file=sys.stderr)
+                continue
+            if results[name]:
+                print(results[name])
+    elapsed = time.perf_counter() - start
+
+    if pool:
+        pool.close()
+
+    if args.csv:
+        print("CSVs created in results/ directory.")
+    report(timings)
+    print(f"{len(timings)} of {len(args.sources)} sources done in {elapsed:.3f}s")
+    metrics.report(args.sources, timings, results, elapsed)
+    if failed:
+        sys.exit("Failed: " + ", ".join(failed))
+
+
+if __name__ == "__main__":
+    main()
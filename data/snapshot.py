@@ -0,0 +1,196 @@
+"""
+Load data into a snapshot: a SQLite file with the same tables as the database, which the API can
+serve from instead of Postgres (see api/README.md).
+
+Pass --snapshot PATH to any of the scripts (or run_all.py) to load into the snapshot at PATH
+rather than the database; it's created if it doesn't exist. The scripts' load() functions take a
+Connection from connect() in place of a psycopg one: the helpers in db.py write to it with
+SQLite's own statements, and the scripts' other queries are translated (see Connection).
+
+Values of the database's enum types are stored as plain text, and the enums' values are recorded
+in the enum_value table, in order, so that the API can sort them the same way Postgres does.
+
+The file is in WAL mode, so the API can keep reading it while a script is loading it, and sees
+each load once it's been committed, as it would with the database.
+"""
+
+from datetime import date, datetime, timezone
+from pathlib import Path
+import re
+import sqlite3
+
+SCHEMA = Path(__file__).parent / "create_snapshot_tables.sql"
+# seconds to wait for another script to finish writing to the snapshot
+BUSY_TIMEOUT = 60
+
+# values of the database's enum types, in order (see create_tables.sql)
+enums = {
+    "geographic_area": ["United States", "DVRPC Region", "Philadelphia MSA", "Trenton MSA"],
+    "industry_group": [
+        "Mining, Logging, and Construction",
+        "Manufacturing",
+        "Trade, Transportation, and Utilities",
+        "Information",
+        "Financial Activities",
+        "Professional and Business Services",
+        "Education and Health Services",
+        "Leisure and Hospitality",
+        "Other Services",
+        "Government",
+        "Total Nonfarm",
+    ],
+}
+
+# (dates are stored as ISO 8601 text, which sorts and compares like the dates themselves)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: bool(int(value)))
+
+# a %s placeholder, or a comparison with any value in a list
+placeholder = re.compile(r"= ANY\(%s\)|%s")
+
+
+def translate(query: str, params=None) -> tuple:
+    """
+    Translate *query*, written for psycopg, and its *params* for SQLite: each %s placeholder
+    becomes ?, and each "= ANY(%s)" becomes "IN (?, ?, ...)", with a placeholder per item of its
+    list.
+    """
+    values = iter(params or ())
+    translated = []
+
+    def replace(match):
+        value = next(values)
+        if match.group() == "%s":
+            translated.append(value)
+            return "?"
+        translated.extend(value)
+        return "IN (" + ", ".join("?" * len(value)) + ")"
+
+    return placeholder.sub(replace, query), translated
+
+
+class Connection:
+    """
+    A connection to a snapshot, which can be used in place of a psycopg connection by the
+    scripts' load() functions.
+
+    Queries are translated with translate(), so they run as long as they otherwise use SQL that
+    SQLite understands too. Used as a context manager, everything is done in a single
+    transaction, which is committed at the end (or rolled back if there's an exception), and the
+    connection is then closed.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def execute(self, query: str, params=None) -> sqlite3.Cursor:
+        return self.connection.execute(*translate(query, params))
+
+    def executemany(self, query: str, params_seq) -> sqlite3.Cursor:
+        return self.connection.executemany(query.replace("%s", "?"), params_seq)
+
+    def cursor(self):
+        # (a cursor is only ever used for executemany(), which this provides itself)
+        return self
+
+    def __enter__(self):
+        # (the write lock is taken up front, since a transaction that has read from a snapshot
+        # can't start writing to it if another has written in the meantime)
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.connection.close()
+
+
+def connect(path) -> Connection:
+    """Open the snapshot at *path*, creating it (or any of its tables that are missing) first."""
+    connection = sqlite3.connect(
+        path, timeout=BUSY_TIMEOUT, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None
+    )
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(SCHEMA.read_text())
+    connection.executemany(
+        """
+        INSERT INTO enum_value (type_name, value, sort_order)
+        VALUES (?, ?, ?)
+        ON CONFLICT (type_name, value)
+        DO UPDATE SET sort_order = excluded.sort_order
+        """,
+        [
+            (type_name, value, i)
+            for type_name, values in enums.items()
+            for i, value in enumerate(values)
+        ],
+    )
+    return Connection(connection)
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def select(conn: Connection, table: str, columns: list, first: date, last: date):
+    """Get *columns* of the rows in *table* from period *first* to *last*."""
+    return conn.connection.execute(
+        f"SELECT {', '.join(map(quote, columns))} FROM {quote(table)} "
+        "WHERE period BETWEEN ? AND ?",
+        (first, last),
+    )
+
+
+def insert(conn: Connection, table: str, columns: list, key: list, rows: list):
+    """Insert *rows* into *table*, with the same rules for conflicts as db.upsert()."""
+    set_columns = [column for column in columns if column not in key]
+    updates = ", ".join(f"{quote(column)} = excluded.{quote(column)}" for column in set_columns)
+    if "preliminary" in columns:
+        condition = f"{quote(table)}.preliminary AND NOT excluded.preliminary"
+    else:
+        condition = " OR ".join(
+            f"{quote(table)}.{quote(column)} IS NOT excluded.{quote(column)}"
+            for column in set_columns
+        )
+    conflict = f"DO UPDATE SET {updates} WHERE {condition}"
+    conn.connection.executemany(
+        f"INSERT INTO {quote(table)} ({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(quote, key))}) {conflict}",
+        rows,
+    )
+
+
+def update_complete_periods(conn: Connection, table: str, periods, num_areas: int):
+    """As db.update_complete_periods()."""
+    conn.execute(
+        f"""
+        INSERT INTO complete_periods (table_name, period)
+        SELECT %s, period
+        FROM {quote(table)}
+        WHERE period = ANY(%s)
+        GROUP BY period
+        HAVING COUNT(area) = %s
+        ON CONFLICT DO NOTHING
+        """,
+        (table, list(periods), num_areas),
+    )
+
+
+def bump_data_version(conn: Connection, table: str):
+    """As db.bump_data_version()."""
+    conn.execute(
+        f"""
+        INSERT INTO data_version (table_name, version, updated_at, max_period)
+        VALUES (%s, 1, %s, (SELECT max(period) FROM {quote(table)}))
+        ON CONFLICT (table_name)
+        DO UPDATE
+        SET
+            version = data_version.version + 1,
+            updated_at = excluded.updated_at,
+            max_period = excluded.max_period
+        """,
+        (table, datetime.now(timezone.utc).isoformat()),
+    )
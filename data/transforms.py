@@ -0,0 +1,55 @@
+"""
+Transformations shared by the scripts in this directory.
+"""
+
+from datetime import date
+
+
+def years_before(period: date, years: int) -> date:
+    return date(period.year - years, period.month, period.day)
+
+
+def lagged_values(records: list, value: str, series: list, years: int) -> list:
+    """
+    Get the *value* of the record *years* before each of *records* in the same series, or None if
+    there isn't one (e.g. before the start of the data).
+
+    Records are dicts with a "period" and the keys in *series*, which together identify the
+    series they belong to (e.g. ["area", "industry"]). They're looked up by (series, period), so
+    this takes one pass over *records* rather than a search of them for each record.
+    """
+    by_period = {}
+    for record in records:
+        key = tuple(record[k] for k in series)
+        by_period.setdefault((key, record["period"]), record[value])
+
+    return [
+        by_period.get((tuple(record[k] for k in series), years_before(record["period"], years)))
+        for record in records
+    ]
+
+
+def drop_lag_years(records: list, years: int) -> list:
+    """
+    Drop the records in the first *years* years of *records*, which were only fetched to calculate
+    the changes from them (see bls.fetch()).
+    """
+    if not records or not years:
+        return records
+    first_year = min(record["period"].year for record in records) + years
+    return [record for record in records if record["period"].year >= first_year]
+
+
+def change(current, previous, digits: int):
+    """Get the change from *previous* to *current*, rounded to *digits*, or None if none."""
+    if previous is None:
+        return None
+    return round(float(current) - float(previous), digits)
+
+
+def percent_change(current, previous, digits: int):
+    """Get the % change from *previous* to *current*, rounded to *digits*, or None if none."""
+    if previous is None:
+        return None
+    previous = float(previous)
+    return round(((float(current) - previous) / previous) * 100, digits)
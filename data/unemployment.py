@@ -3,110 +3,72 @@ Fetch unemployment data (CPS) from BLS's API.
 
 If --csv is passed to the program (python3 unemployment.py --csv), it will create a CSV of
 the fetched data. Otherwise, it will insert it into the database specified in the PG_CREDS
-variable in config.py.
+variable in config.py. With --snapshot PATH, it will load it into the snapshot at PATH
+(see snapshot.py) instead.
+
+The fetch, parse and load steps can also be imported and run by run_all.py.
 """
 
 import argparse
 import csv
-from datetime import date
-import json
 from pathlib import Path
+import sqlite3
 import sys
 
 import psycopg
-import requests
-
-from config import BLS_API_KEY
 
+import bls
+from db import bump_data_version, update_complete_periods, upsert
+from fetch import FetchError, set_mode
+import snapshot
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--csv", action="store_true")
-args = parser.parse_args()
-
-# we don't need a database connection if just trying to create a CSV
-if args.csv:
-    PG_CREDS = ""
-else:
-    from config import PG_CREDS
+table = "unemployment_rate"
 
 us = "LNS14000000"
 philadelphia = "LAUMT423798000000003"
 trenton = "LAUMT344594000000003"
 
-# Get data from API
-headers = {"Content-type": "application/json"}
-data = json.dumps(
-    {
-        "seriesid": [us, philadelphia, trenton],
-        "registrationkey": BLS_API_KEY,
-    }
-)
 
-p = requests.post("https://api.bls.gov/publicAPI/v2/timeseries/data/", data=data, headers=headers)
-if p.status_code != 200:
-    sys.exit(f"Unable to fetch data from BLS API.")
+def fetch(start_year: int = None, end_year: int = None) -> list:
+    """Get the series from BLS's API, for bls.DEFAULT_YEARS unless given."""
+    return bls.fetch([us, philadelphia, trenton], start_year, end_year)
 
-json_data = json.loads(p.text)
 
-if args.csv:
+def parse(series_list: list) -> list:
+    """Create a list of [period, area, rate, preliminary] from the series."""
     cleaned_data = []
-
-# go through results and either add to db or (for --csv), put into list for later
-try:
-    with psycopg.connect(PG_CREDS) as conn:
-        for series in json_data["Results"]["series"]:
-            if series["seriesID"] == us:
-                area = "United States"
-            if series["seriesID"] == philadelphia:
-                area = "Philadelphia MSA"
-            if series["seriesID"] == trenton:
-                area = "Trenton MSA"
-
-            for record in series["data"]:
-                period = date.fromisoformat(
-                    record["year"] + "-" + (str(record["period"][1:]) + "-01")
-                )
-
-                # determine if preliminary data
-                for each in record["footnotes"]:
-                    preliminary = True if each.get("code") == "P" else False
-
-                if args.csv:
-                    cleaned_data.append([period, area, record["value"], preliminary])
-                else:
-                    # Insert new record or update rate/prelim if data is no longer preliminary.
-                    # Further explanation:
-                    # If a conflict on PERIOD and AREA (i.e. already a record for that
-                    # period/area), then update the values for RATE and PRELIMINARY
-                    # **if and only if**
-                    # the previous value for PRELIMINARY (unemployment_rate.preliminary) was true
-                    # and current value for PRELIMINARY (excluded.preliminary) is false
-                    conn.execute(
-                        """
-                        INSERT INTO unemployment_rate
-                        (period, area, rate, preliminary)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (period, area)
-                        DO UPDATE
-                        SET
-                            rate = %s,
-                            preliminary = 'f'
-                        WHERE
-                            unemployment_rate.preliminary = 't' AND
-                            excluded.preliminary = 'f'
-                    """,
-                        (
-                            period,
-                            area,
-                            record["value"],
-                            preliminary,
-                            record["value"],
-                        ),
-                    )
-except psycopg.OperationalError:
-    sys.exit("Database error.")
-
-if args.csv:
+    for series in series_list:
+        if series["seriesID"] == us:
+            area = "United States"
+        if series["seriesID"] == philadelphia:
+            area = "Philadelphia MSA"
+        if series["seriesID"] == trenton:
+            area = "Trenton MSA"
+
+        for record in series["data"]:
+            cleaned_data.append(
+                [bls.period(record), area, record["value"], bls.preliminary(record)]
+            )
+    return cleaned_data
+
+
+def load(conn, cleaned_data: list):
+    """Add *cleaned_data* to the database, and return the LoadResult."""
+    # Insert new records, or update rate/prelim if data is no longer preliminary.
+    result = upsert(
+        conn,
+        table,
+        ["period", "area", "rate", "preliminary"],
+        ["period", "area"],
+        cleaned_data,
+    )
+    if result.changed:
+        update_complete_periods(conn, table, result.periods, 3)
+        bump_data_version(conn, table)
+    return result
+
+
+def write_csv(cleaned_data: list):
     results_dir = "results"
     try:
         Path(results_dir).mkdir()
@@ -118,4 +80,50 @@ if args.csv:
         writer.writerow(["period", "area", "rate", "preliminary data"])
         writer.writerows(cleaned_data)
 
-    print("CSV created in results/ directory.")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--snapshot", help="load into the snapshot at this path")
+    parser.add_argument("--replay", action="store_true", help="only use recorded responses")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    args = parser.parse_args()
+    try:
+        bls.years(args.start_year, args.end_year)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.replay:
+        set_mode("replay")
+
+    try:
+        cleaned_data = parse(fetch(args.start_year, args.end_year))
+    except FetchError as e:
+        sys.exit(str(e))
+
+    # add to db or (for --csv), create CSV
+    if args.csv:
+        write_csv(cleaned_data)
+        print("CSV created in results/ directory.")
+        return
+
+    if args.snapshot:
+        try:
+            with snapshot.connect(args.snapshot) as conn:
+                print(load(conn, cleaned_data))
+        except sqlite3.OperationalError as e:
+            sys.exit(f"Snapshot error: {e}")
+        return
+
+    # (we don't need a database connection if just trying to create a CSV)
+    from config import PG_CREDS
+
+    try:
+        with psycopg.connect(PG_CREDS) as conn:
+            print(load(conn, cleaned_data))
+    except psycopg.OperationalError:
+        sys.exit("Database error.")
+
+
+if __name__ == "__main__":
+    main()